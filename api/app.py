@@ -0,0 +1,150 @@
+""" Headless HTTP API for BSE monthly and quarter-end closes: uvicorn api.app:app --host 0.0.0.0 --port 8081"""
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import time
+from email.utils import formatdate
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import pandas as pd
+from cachetools import TTLCache
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
+
+import bse_export
+import bse_metrics
+from bse_cache import result_cache
+from bse_scraper_v2 import bse_scraper_2
+from bse_store import monthly_store
+
+MEDIA_TYPES = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    **bse_export.MEDIA_TYPES,
+}
+FORMAT = Query("json", pattern="^(json|ndjson|arrow|parquet)$")
+
+scraper = bse_scraper_2(store=monthly_store(os.environ["BSE_STORE_PATH"]) if os.environ.get("BSE_STORE_PATH") else None)
+results = result_cache()
+metrics = bse_metrics.register(bse_metrics.prometheus_hooks())
+## first time we served a given body, for Last-Modified
+_first_seen = TTLCache(maxsize=8192, ttl=24 * 3600)
+
+app = FastAPI(title="BSE closing prices", version="1.0")
+
+
+def _check_code(scrip: str) -> str:
+    scrip = scrip.strip()
+    if not scrip.isdigit():
+        raise HTTPException(status_code=400, detail=f"Not a numeric BSE scrip code: {scrip!r}")
+    return scrip
+
+
+async def _closes(scrip: str, from_month: int, from_year: int, quarterly: bool) -> pd.DataFrame:
+    ## the scraper's blocking API hands the network work to its own event loop
+    df = await asyncio.to_thread(results.get_or_fetch, scraper._recurse_until_today, scrip, from_month, from_year)
+    return scraper._get_quarterly_dates(df) if quarterly else df
+
+
+def _long(scrip: str, df: pd.DataFrame) -> pd.DataFrame:
+    return pd.DataFrame({
+        "scrip_code": scrip,
+        "month": df["Quarter End"].astype(str).to_numpy(),
+        "close": pd.to_numeric(df["Close"], errors="coerce").to_numpy(dtype="float64"),
+    })
+
+
+def _encode(df: pd.DataFrame, fmt: str) -> bytes:
+    if fmt in bse_export.MEDIA_TYPES:
+        return bse_export.to_bytes(bse_export.to_table(df, "scrip_code", "month", "close"), fmt)
+    if fmt == "ndjson":
+        return df.to_json(orient="records", lines=True).encode()
+    return df.to_json(orient="records").encode()
+
+
+async def _one(request: Request, scrip: str, from_month: int, from_year: int, fmt: str, quarterly: bool) -> Response:
+    scrip = _check_code(scrip)
+    try:
+        df = await _closes(scrip, from_month, from_year, quarterly)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Fetching {scrip} from BSE failed: {e!r}")
+
+    body = _encode(_long(scrip, df), fmt)
+    etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(_first_seen.setdefault(etag, time.time()), usegmt=True),
+        ## the open month changes during the day, closed months do not
+        "Cache-Control": "public, max-age=60",
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=MEDIA_TYPES[fmt], headers=headers)
+
+
+async def _many(codes: str, from_month: int, from_year: int, fmt: str, quarterly: bool) -> Response:
+    scrips = list(dict.fromkeys(_check_code(c) for c in codes.split(",") if c.strip()))
+    if not scrips:
+        raise HTTPException(status_code=400, detail="No scrip codes given")
+
+    async def fetch(scrip):
+        try:
+            return scrip, await _closes(scrip, from_month, from_year, quarterly), None
+        except Exception as e:
+            return scrip, None, repr(e)
+
+    tasks = [asyncio.ensure_future(fetch(s)) for s in scrips]
+
+    if fmt == "ndjson":
+        async def stream():
+            ## one line per row, scrips in completion order; failures get an error line
+            for done in asyncio.as_completed(tasks):
+                scrip, df, error = await done
+                if error is not None:
+                    yield (json.dumps({"scrip_code": scrip, "error": error}) + "\n").encode()
+                elif len(df):
+                    yield _encode(_long(scrip, df), "ndjson")
+        return StreamingResponse(stream(), media_type=MEDIA_TYPES["ndjson"])
+
+    fetched = await asyncio.gather(*tasks)
+    frames = [_long(s, df) for s, df, error in fetched if error is None]
+    errors = {s: error for s, _, error in fetched if error is not None}
+    df = pd.concat(frames, ignore_index=True) if frames else _long("", pd.DataFrame({"Quarter End": [], "Close": []}))
+    headers = {"X-Scrip-Errors": json.dumps(errors)} if errors else {}
+    return Response(content=_encode(df, fmt), media_type=MEDIA_TYPES[fmt], headers=headers)
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/monthly/{scrip}")
+async def monthly_one(request: Request, scrip: str, from_month: int = Query(1, ge=1, le=12), from_year: int = Query(2024, ge=2000), format: str = FORMAT):
+    return await _one(request, scrip, from_month, from_year, format, quarterly=False)
+
+
+@app.get("/quarterly/{scrip}")
+async def quarterly_one(request: Request, scrip: str, from_month: int = Query(1, ge=1, le=12), from_year: int = Query(2024, ge=2000), format: str = FORMAT):
+    return await _one(request, scrip, from_month, from_year, format, quarterly=True)
+
+
+@app.get("/monthly")
+async def monthly_many(scrips: str = Query(..., description="comma separated scrip codes"), from_month: int = Query(1, ge=1, le=12), from_year: int = Query(2024, ge=2000), format: str = FORMAT):
+    return await _many(scrips, from_month, from_year, format, quarterly=False)
+
+
+@app.get("/quarterly")
+async def quarterly_many(scrips: str = Query(..., description="comma separated scrip codes"), from_month: int = Query(1, ge=1, le=12), from_year: int = Query(2024, ge=2000), format: str = FORMAT):
+    return await _many(scrips, from_month, from_year, format, quarterly=True)
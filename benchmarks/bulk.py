@@ -0,0 +1,64 @@
+"""
+Full-history fetches against a stand-in that caps the months per response.
+
+    python benchmarks/bulk.py [--since "Jan 10"] [--delay 0.5]
+
+For each cap (none, 12, 24, 60 months) a fresh scraper fetches the whole history of one
+scrip (it has to discover the cap), then of a second one (windows planned from the learned
+months_per_response), then the same with parallel_windows off, which is the old one POST
+after the other. Reports POSTs, wall time and the learned cap as JSON.
+"""
+import argparse
+import contextlib
+import io
+import json
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from bse_scraper_v2 import bse_scraper_2
+from benchmarks.stand_in_server import MONTHS, inject, serve_history, start_server
+
+CAPS = (None, 12, 24, 60)
+
+
+def run(cap, since, delay, parallel):
+    server, base_url = start_server()
+    serve_history(server, since, months_per_response=cap)
+    inject(server, delay=delay)
+    scraper = bse_scraper_2(rate_per_host=1e6)
+    scraper.base_url = base_url
+    scraper.parallel_windows = parallel
+    month, year = since.split()
+    report = {}
+    for i, phase in enumerate(("first_scrip", "next_scrip")):
+        posts = server.counts["POST"]
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            df = scraper._fetch_until_today(500400 + i, MONTHS.index(month) + 1, 2000 + int(year))
+        report[phase] = {"months": len(df), "posts": server.counts["POST"] - posts, "wall_s": round(time.perf_counter() - t0, 3)}
+    report["months_per_response"] = scraper.months_per_response.get("auto")
+    server.shutdown()
+    return report
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--since", default="Jan 10")
+    ap.add_argument("--delay", type=float, default=0.5, help="server time per request, seconds")
+    args = ap.parse_args()
+    out = {}
+    for cap in CAPS:
+        out[f"cap_{cap or 'none'}"] = {
+            "parallel": run(cap, args.since, args.delay, True),
+            "sequential": run(cap, args.since, args.delay, False),
+        }
+    print(json.dumps(out, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Bytes and CPU per fetch with compressed responses and the streamed token GET.
+
+    python benchmarks/compact.py [--fetches 30]
+
+The stand-in replays debug_stage_initial.html / ans.html uncompressed, gzip or br (br needs
+brotli). For each encoding a fresh scraper does --fetches cold fetches (token GET + POST
+every time), with the GET read in full and then streamed up to the form's last input.
+Reports received bytes per GET and POST (as counted by httpx, before decoding), process CPU
+per fetch and the token_parse time as JSON. Process CPU includes the stand-in's threads,
+which only replay precompressed pages. Over loopback the body arrives in 64 KB reads, so
+the streamed GET receives as much as the full one; what it saves here is the parse of the
+tail. "harvest" times _harvest_inputs on the whole fixture and on the streamed part.
+"""
+import argparse
+import contextlib
+import io
+import json
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import bse_metrics
+from bse_scraper_v2 import _until_form_read, bse_scraper_2
+from bse_tokens import token_cache
+from benchmarks.stand_in_server import serve_compressed, start_server
+
+
+class _tally(bse_metrics.hooks):
+    """ Received bytes per request method and total seconds per span"""
+
+    def __init__(self):
+        self.bytes = {"GET": 0, "POST": 0}
+        self.requests = {"GET": 0, "POST": 0}
+        self.seconds = {}
+        self._method = None
+
+    def end_span(self, token, stage, labels, seconds, error):
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+
+    def count(self, name, value, labels):
+        ## bse_requests_total comes right before the bytes of the same response
+        if name == "bse_requests_total":
+            self._method = labels["method"]
+            self.requests[self._method] += 1
+        elif name == "bse_bytes_total" and labels["direction"] == "received":
+            self.bytes[self._method] += value
+
+
+def run(encodings, stream, fetches):
+    server, base_url = start_server()
+    serve_compressed(server, encodings)
+    scraper = bse_scraper_2(tokens=token_cache(ttl=0), rate_per_host=1e6)
+    scraper.base_url = base_url
+    scraper.stream_tokens = stream
+    with contextlib.redirect_stdout(io.StringIO()):
+        scraper._get_monthly_table(500325, 3, 2024) ## warm up imports and the connection
+    tally = bse_metrics.register(_tally())
+    cpu, wall = time.process_time(), time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(fetches):
+                scraper._get_monthly_table(500325, 3, 2024)
+    finally:
+        bse_metrics.unregister(tally)
+    cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+    server.shutdown()
+    return {
+        "get_bytes": round(tally.bytes["GET"] / tally.requests["GET"]),
+        "post_bytes": round(tally.bytes["POST"] / tally.requests["POST"]),
+        "cpu_ms_per_fetch": round(cpu / fetches * 1e3, 2),
+        "wall_ms_per_fetch": round(wall / fetches * 1e3, 2),
+        "token_parse_ms": round(tally.seconds.get("token_parse", 0.0) / fetches * 1e3, 2),
+    }
+
+
+def harvest(repeats):
+    """ CPU of _harvest_inputs on debug_stage_initial.html, whole and cut where the streamed GET stops"""
+    page = (ROOT / "debug_stage_initial.html").read_bytes()
+    cut = _until_form_read()(bytearray(page))
+    scraper = bse_scraper_2()
+    out = {"page_bytes": len(page), "streamed_bytes": cut}
+    for name, html in (("full_ms", page.decode("utf-8")), ("streamed_ms", page[:cut].decode("utf-8"))):
+        runs = []
+        for _ in range(repeats):
+            t0 = time.process_time()
+            scraper._harvest_inputs(html)
+            runs.append(time.process_time() - t0)
+        out[name] = round(sorted(runs)[len(runs) // 2] * 1e3, 2)
+    out["same_inputs"] = scraper._harvest_inputs(page.decode("utf-8")) == scraper._harvest_inputs(page[:cut].decode("utf-8"))
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--fetches", type=int, default=30)
+    args = ap.parse_args()
+    out = {"harvest": harvest(args.fetches)}
+    for name, encodings in (("identity", ()), ("gzip", ("gzip",)), ("br", ("br",))):
+        out[name] = {
+            "full_get": run(encodings, False, args.fetches),
+            "streamed_get": run(encodings, True, args.fetches),
+        }
+    print(json.dumps(out, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Import-time budget for the modules a cold container loads before its first request.
+
+    python benchmarks/import_time.py [--budget-ms 150] [--repeats 5]
+
+Each target is imported in a fresh `python -X importtime` process and the best cumulative
+time over the repeats is reported. Any heavy dependency (pandas, numpy, lxml, bs4, httpx,
+pyarrow, playwright) loaded at import time also fails the check. Those must load on first
+use, not at import. Exits 1 when a target is over budget or imports one of them.
+"""
+import argparse
+import json
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+## what frontend/app.py and the legacy scraper pull in at startup
+TARGETS = {
+    "frontend": "import bse_scraper_v2, bse_router, bse_scrips, bse_cache",
+    "bse_scraper_v2": "import bse_scraper_v2",
+    "bse_scraper": "import bse_scraper",
+    "bse_cache": "import bse_cache",
+}
+HEAVY = ("pandas", "numpy", "lxml", "bs4", "httpx", "pyarrow", "playwright")
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s+)(\S+)$")
+
+
+def import_profile(statement: str):
+    """ (cumulative µs of the statement, top-level packages it imported) from one fresh interpreter"""
+    ## the baseline interpreter (site, encodings) is not part of our budget
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stderr
+    base = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "pass"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stderr
+
+    def parse(text):
+        total, names = 0, set()
+        for line in text.splitlines():
+            m = _LINE.match(line)
+            if not m:
+                continue
+            names.add(m.group(4).split(".")[0])
+            if len(m.group(3)) == 1: ## top level entries, their cumulative time includes the children
+                total += int(m.group(2))
+        return total, names
+
+    total, names = parse(out)
+    base_total, base_names = parse(base)
+    return total - base_total, names - base_names
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--budget-ms", type=float, default=150.0)
+    ap.add_argument("--repeats", type=int, default=5)
+    args = ap.parse_args()
+
+    report, failed = {}, False
+    for name, statement in TARGETS.items():
+        runs = [import_profile(statement) for _ in range(args.repeats)]
+        best = min(us for us, _ in runs) / 1e3
+        heavy = sorted(set(HEAVY) & runs[0][1])
+        over = best > args.budget_ms
+        failed |= over or bool(heavy)
+        report[name] = {"import_ms": round(best, 1), "heavy_imports": heavy, "ok": not over and not heavy}
+
+    print(json.dumps({"budget_ms": args.budget_ms, "targets": report}, indent=2))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
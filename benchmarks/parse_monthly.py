@@ -0,0 +1,61 @@
+"""
+Compare the fast divStkData parser against the BeautifulSoup + read_html path.
+
+    python benchmarks/parse_monthly.py [fixture.html] [repeats]
+
+Defaults to ans.html, the captured POST response that holds the monthly table.
+"""
+import json
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from bse_scraper_v2 import bse_scraper_2
+
+
+def _time(fn, repeats):
+    runs = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - t0)
+    runs.sort()
+    return {"median_ms": runs[len(runs) // 2] * 1e3, "min_ms": runs[0] * 1e3}
+
+
+def main():
+    fixture = Path(sys.argv[1]) if len(sys.argv) > 1 else ROOT / "ans.html"
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    html = fixture.read_text(encoding="utf-8")
+    s = bse_scraper_2()
+
+    def slow():
+        df = s._decompose_monthly_table(html)
+        df["Close"] = pd.to_numeric(df["Close"].astype(str).str.replace(",", ""), errors="coerce")
+        return df
+
+    fast_df, slow_df = s._fast_monthly_table(html), slow()
+    if fast_df is None:
+        raise SystemExit(f"{fixture.name} has no monthly table")
+    same = fast_df["Quarter End"].tolist() == slow_df["Quarter End"].tolist() and \
+        fast_df["Close"].tolist() == slow_df["Close"].tolist()
+
+    fast, slow_t = _time(lambda: s._fast_monthly_table(html), repeats), _time(slow, repeats)
+    print(json.dumps({
+        "fixture": fixture.name,
+        "rows": len(fast_df),
+        "identical": same,
+        "fast": fast,
+        "soup_read_html": slow_t,
+        "speedup": slow_t["median_ms"] / fast["median_ms"],
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Offline benchmark of the bse_scraper_2 pipeline against the captured debug_stage_* pages.
+
+    python benchmarks/run.py [--repeats 30] [--concurrency 8] [--out results.json]
+
+Stages: end-to-end fetch through the local stand-in server (cold tokens, warm tokens and
+concurrent), token extraction, table parsing and quarterly filtering. Every stage reports
+latency percentiles, throughput and peak traced memory as JSON.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import pandas as pd
+
+from bse_scraper_v2 import bse_scraper_2
+from bse_tokens import token_cache
+from benchmarks.stand_in_server import start_server
+
+
+def _percentile(sorted_runs, q):
+    idx = min(len(sorted_runs) - 1, int(round(q * (len(sorted_runs) - 1))))
+    return sorted_runs[idx]
+
+
+def _summary(runs, wall, ops, peak):
+    runs = sorted(runs)
+    return {
+        "n": len(runs),
+        "p50_ms": _percentile(runs, 0.50) * 1e3,
+        "p90_ms": _percentile(runs, 0.90) * 1e3,
+        "p99_ms": _percentile(runs, 0.99) * 1e3,
+        "max_ms": runs[-1] * 1e3,
+        "throughput_per_s": ops / wall if wall else None,
+        "peak_mem_kb": peak / 1024,
+    }
+
+
+def _peak_memory(fn):
+    """ Peak traced allocation of one fn() call; kept apart from timing, tracemalloc is slow"""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure(fn, repeats):
+    """ Time fn() repeats times (after one warm-up) and trace its peak memory"""
+    fn()
+    runs = []
+    wall0 = time.perf_counter()
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - t0)
+    wall = time.perf_counter() - wall0
+    return _summary(runs, wall, repeats, _peak_memory(fn))
+
+
+def measure_concurrent(scraper, concurrency, repeats):
+    """ repeats rounds of `concurrency` fetches in flight at once"""
+    async def one(code):
+        t0 = time.perf_counter()
+        await scraper._aget_monthly_table(code, 3, 2024)
+        return time.perf_counter() - t0
+
+    async def rounds(n):
+        runs = []
+        for _ in range(n):
+            runs += await asyncio.gather(*(one(500000 + i) for i in range(concurrency)))
+        await scraper.aclose()
+        return runs
+
+    wall0 = time.perf_counter()
+    runs = asyncio.run(rounds(repeats))
+    wall = time.perf_counter() - wall0
+    return _summary(runs, wall, len(runs), _peak_memory(lambda: asyncio.run(rounds(1))))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--repeats", type=int, default=30)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--out", help="write the JSON here instead of stdout")
+    args = ap.parse_args()
+
+    server, base_url = start_server()
+    initial_html = (ROOT / "debug_stage_initial.html").read_text(encoding="utf-8")
+    result_html = (ROOT / "ans.html").read_text(encoding="utf-8")
+
+    ## the stand-in is local, do not let the BSE rate limit shape the timings
+    cold = bse_scraper_2(tokens=token_cache(ttl=0), rate_per_host=1e6)
+    warm = bse_scraper_2(max_per_host=args.concurrency, rate_per_host=1e6)
+    for s in (cold, warm):
+        s.base_url = base_url
+
+    monthly = warm._parse_monthly_response(result_html)
+    ## quarterly filtering is cheap on one scrip, time it on a multi-decade sized frame
+    big = pd.concat([monthly] * 500, ignore_index=True)
+
+    results = {}
+    ## the scraper prints a line per fetch, keep it out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        results["e2e_cold_tokens"] = measure(lambda: cold._get_monthly_table(500400, 3, 2024), args.repeats)
+        results["e2e_warm_tokens"] = measure(lambda: warm._get_monthly_table(500400, 3, 2024), args.repeats)
+        results["e2e_concurrent"] = measure_concurrent(warm, args.concurrency, max(1, args.repeats // args.concurrency))
+    results["token_extraction"] = measure(lambda: warm._harvest_inputs(initial_html), args.repeats)
+    results["table_parsing"] = measure(lambda: warm._parse_monthly_response(result_html), args.repeats)
+    results["quarterly_filter"] = measure(lambda: warm._get_quarterly_dates(big), args.repeats)
+    results["quarterly_filter"]["rows"] = len(big)
+    results["server_requests"] = dict(server.counts)
+    server.shutdown()
+
+    report = json.dumps({"python": sys.version.split()[0], "pandas": pd.__version__, "stages": results}, indent=2)
+    if args.out:
+        Path(args.out).write_text(report)
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+Local stand-in for bseindia.com's StockPrcHistori.aspx, replaying the captured pages.
+
+GET  -> debug_stage_initial.html (the form with its __VIEWSTATE & co)
+POST -> ans.html (monthly table), or a CSV when __EVENTTARGET is the Download button
+
+inject() makes it misbehave like a throttling server: extra latency, a share of requests
+answered with 503/429 (+ Retry-After), and 429 above a number of concurrent requests.
+serve_history() answers each POST with rows for the requested months instead (built from
+ans.html's first row), optionally at most months_per_response of them, and with BSE's
+"No Records Found." page when the history has none of them. serve_compressed()
+makes it honour Accept-Encoding (gzip, and br with brotli installed) like bseindia.com does.
+
+    python benchmarks/stand_in_server.py [port]
+"""
+import datetime as dt
+import random
+import re
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from bse_frames import MONTHS
+
+PAGE_PATH = "/markets/equity/EQReports/StockPrcHistori.aspx"
+DOWNLOAD_TARGET = "ctl00$ContentPlaceHolder1$btnDownload"
+
+
+class _handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" ## keep-alive, like the real server
+    ## headers and body go out in separate writes; with Nagle a small (compressed) body waits for the delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status: int, body: bytes, content_type: str = "text/html; charset=utf-8"):
+        encoding = self._encoding() if status == 200 else None
+        if encoding:
+            body = _encoded(self.server, body, encoding)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+            self.send_header("Vary", "Accept-Encoding")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Set-Cookie", "ASP.NET_SessionId=standin; path=/; HttpOnly")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _encoding(self):
+        """ The first of the server's encodings the request accepts, None for identity"""
+        accepted = {e.split(";")[0].strip() for e in self.headers.get("Accept-Encoding", "").split(",")}
+        return next((e for e in self.server.encodings if e in accepted), None)
+
+    def _fault(self) -> bool:
+        """ Answers with an injected failure when one is due; True if it did"""
+        faults = self.server.faults
+        if faults["delay"]:
+            time.sleep(faults["delay"])
+        status = None
+        if faults["max_inflight"] is not None and self.server.inflight > faults["max_inflight"]:
+            status = 429
+        elif faults["error_rate"] and random.random() < faults["error_rate"]:
+            status = faults["status"]
+        if status is None:
+            return False
+        self.server.counts[status] = self.server.counts.get(status, 0) + 1
+        self.send_response(status)
+        if faults["retry_after"] is not None:
+            self.send_header("Retry-After", str(faults["retry_after"]))
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+        return True
+
+    def _counted(self, handle):
+        """ Run handle() while counted as in flight (idle keep-alive connections are not)"""
+        with self.server.lock:
+            self.server.inflight += 1
+        try:
+            if not self._fault():
+                handle()
+        finally:
+            with self.server.lock:
+                self.server.inflight -= 1
+
+    def do_GET(self):
+        if urlsplit(self.path).path != PAGE_PATH:
+            return self._reply(404, b"not found")
+        self.server.counts["GET"] += 1
+        self._counted(lambda: self._reply(200, self.server.initial_page))
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if urlsplit(self.path).path != PAGE_PATH:
+            return self._reply(404, b"not found")
+        self.server.counts["POST"] += 1
+        self._counted(lambda: self._post(body))
+
+    def _post(self, body: bytes):
+        form = parse_qs(body.decode("utf-8"), keep_blank_values=True)
+
+        ## the real page answers a postback without its tokens with an error page
+        if not form.get("__VIEWSTATE", [""])[0] or not form.get("__EVENTVALIDATION", [""])[0]:
+            return self._reply(500, b"Invalid postback or callback argument.")
+        if form.get("__EVENTTARGET", [""])[0] == DOWNLOAD_TARGET:
+            return self._reply(200, self.server.download_csv, "text/csv")
+        page = _history_page(self.server, form) if self.server.history is not None else self.server.result_page
+        self._reply(200, _for_scrip(page, _field(form, "hdnCode")))
+
+
+def _field(form, name: str) -> str:
+    return form.get("ctl00$ContentPlaceHolder1$" + name, [""])[0]
+
+
+_SCRIP_FIELDS = re.compile(rb'(\$(?:hdnCode|hiddenScripCode)"[^>]*?\bvalue=")[^"]*(")')
+
+
+def _for_scrip(page: bytes, code: str) -> bytes:
+    """ The page with the posted scrip code in its hidden fields, as BSE echoes it"""
+    return _SCRIP_FIELDS.sub(lambda m: m.group(1) + code.encode() + m.group(2), page)
+
+
+def _encoded(server, body: bytes, encoding: str) -> bytes:
+    """ body compressed like a web server would (gzip -6, br quality 5); the replayed pages are compressed once"""
+    static = body is server.initial_page or body is server.result_page or body is server.no_records_page
+    key = (encoding, id(body))
+    if static and key in server.compressed:
+        return server.compressed[key]
+    if encoding == "br":
+        import brotli
+        data = brotli.compress(body, quality=5)
+    else:
+        z = zlib.compressobj(6, zlib.DEFLATED, 31 if encoding == "gzip" else 15)
+        data = z.compress(body) + z.flush()
+    if static:
+        server.compressed[key] = data
+    return data
+
+
+def _history_page(server, form) -> bytes:
+    """ ans.html with one row per month from cmbMonthly/cmbMYear to hidToDate, within the history and the cap;
+    debug_stage_no_table_final.html when none of them is"""
+    first, last, cap = server.history
+    lo = int(_field(form, "cmbMYear")) * 12 + int(_field(form, "cmbMonthly")) - 1
+    to = dt.datetime.strptime(_field(form, "hidToDate"), "%d/%m/%Y")
+    hi = min(last, to.year * 12 + to.month - 1)
+    lo = max(lo, first)
+    if cap:
+        hi = min(hi, lo + cap - 1)
+    if lo > hi:
+        ## like BSE: no table at all, just the label
+        return server.no_records_page
+    head, row, tail = server.result_parts
+    rows = [row.replace("Mar 24", f"{MONTHS[p % 12]} {p // 12 % 100:02d}") for p in range(lo, hi + 1)]
+    return head + "".join(rows).encode() + tail
+
+
+def _table_parts(page: bytes) -> tuple:
+    """ A result page split around its first data row: (head, row, tail); ValueError if it has no table rows"""
+    page = page.decode("utf-8")
+    try:
+        start = page.index("<tr class='TTRow'>")
+        end = page.index("</tr>", start) + len("</tr>")
+        rows_end = page.index("</table>", end)
+    except ValueError:
+        raise ValueError("serve_history needs a result page with the monthly table (like ans.html)") from None
+    return page[:start].encode(), page[start:end], page[rows_end:].encode()
+
+
+def start_server(port: int = 0, initial: str = "debug_stage_initial.html", result: str = "ans.html"):
+    """ Start the stand-in on a daemon thread; returns (server, base_url) for bse_scraper_2.base_url"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), _handler)
+    server.daemon_threads = True
+    server.initial_page = (ROOT / initial).read_bytes()
+    server.result_page = (ROOT / result).read_bytes()
+    server.no_records_page = (ROOT / "debug_stage_no_table_final.html").read_bytes()
+    server.download_csv = b"Month,Open,High,Low,Close\nMar 24,2916.70,3024.80,2826.90,2976.80\n"
+    server.result_parts = None ## set by serve_history, result need not have a table otherwise
+    server.history = None
+    server.encodings = ()
+    server.compressed = {}
+    server.counts = {"GET": 0, "POST": 0}
+    server.lock = threading.Lock()
+    server.inflight = 0
+    inject(server)
+    threading.Thread(target=server.serve_forever, name="bse-stand-in", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def inject(server, error_rate: float = 0.0, status: int = 503, retry_after=None, max_inflight=None, delay: float = 0.0):
+    """ Set the failures the stand-in injects (all off by default); counts gain one entry per injected status"""
+    server.faults = {"error_rate": error_rate, "status": status, "retry_after": retry_after, "max_inflight": max_inflight, "delay": delay}
+
+
+def serve_history(server, first: str = "Jan 10", last=None, months_per_response=None):
+    """ Answer POSTs with monthly rows from first to last ('Mon YY', default the current month), at most months_per_response per response"""
+    def index(label):
+        month, year = label.split()
+        return (2000 + int(year)) * 12 + MONTHS.index(month)
+    today = dt.date.today()
+    server.result_parts = _table_parts(server.result_page)
+    server.history = (index(first), index(last) if last else today.year * 12 + today.month - 1, months_per_response)
+
+
+def serve_compressed(server, encodings=("br", "gzip")):
+    """ Compress 200 responses with the first of encodings the client accepts (br is skipped without brotli)"""
+    try:
+        import brotli  # noqa: F401
+    except ImportError:
+        encodings = tuple(e for e in encodings if e != "br")
+    server.encodings = tuple(encodings)
+
+
+if __name__ == "__main__":
+    srv, url = start_server(int(sys.argv[1]) if len(sys.argv) > 1 else 8765)
+    print(f"Serving {url}{PAGE_PATH}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        srv.shutdown()
@@ -0,0 +1,81 @@
+"""
+Rate limiter, retries and circuit breaker against a stand-in server that injects failures.
+
+    python benchmarks/throttle.py [--scrips 40] [--concurrency 8]
+
+Scenarios: clean, random 503s with Retry-After, 429 above 2 concurrent requests (the
+window should settle near 2), and an outage (the breaker should open and fail fast).
+Each reports successes, wall time, what the server saw and the limiter's counters as JSON.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from bse_scraper_v2 import bse_scraper_2
+from bse_throttle import retry_policy
+from benchmarks.stand_in_server import inject, start_server
+
+SCENARIOS = {
+    "clean": {},
+    "random_503": {"error_rate": 0.2, "status": 503, "retry_after": 0},
+    "overload_429": {"max_inflight": 2, "delay": 0.02},
+    "outage": {"error_rate": 1.0, "status": 503},
+}
+
+
+def run(name, faults, scrips, concurrency):
+    server, base_url = start_server()
+    inject(server, **faults)
+    scraper = bse_scraper_2(max_per_host=concurrency, rate_per_host=200.0, retry=retry_policy(attempts=4, base=0.05, cap=0.5))
+    scraper.base_url = base_url
+
+    async def one(code):
+        try:
+            await scraper._aget_monthly_table(code, 3, 2024)
+            return None
+        except Exception as e:
+            return type(e).__name__
+
+    async def batch():
+        errors = await asyncio.gather(*(one(500000 + i) for i in range(scrips)))
+        limiter = scraper._limiter()
+        await scraper.aclose()
+        return errors, limiter
+
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        errors, limiter = asyncio.run(batch())
+    wall = time.perf_counter() - t0
+    server.shutdown()
+
+    failed = [e for e in errors if e]
+    return {
+        "ok": len(errors) - len(failed),
+        "failed": {e: failed.count(e) for e in set(failed)},
+        "wall_s": round(wall, 3),
+        "server": {str(k): v for k, v in server.counts.items()},
+        "window": round(limiter.window, 2),
+        "breaker": limiter.state,
+        "limiter": limiter.stats,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--scrips", type=int, default=40)
+    ap.add_argument("--concurrency", type=int, default=8)
+    args = ap.parse_args()
+    print(json.dumps({name: run(name, faults, args.scrips, args.concurrency) for name, faults in SCENARIOS.items()}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
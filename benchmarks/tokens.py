@@ -0,0 +1,73 @@
+"""
+Compare the regex token extractor against the BeautifulSoup path it replaces.
+
+    python benchmarks/tokens.py [fixture.html ...] [--repeats 50]
+
+Defaults to every captured page (debug_stage_*.html and ans.html; _harvest_inputs reads the
+GET and the POST response). For each page the payload dict of _fast_inputs must equal the
+one _collect_inputs + _get_settlement_value build from the soup; exits 1 otherwise. Reports
+both timings and the speedup as JSON.
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import bs4
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from bse_scraper_v2 import bse_scraper_2
+
+
+def _time(fn, repeats):
+    runs = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - t0)
+    runs.sort()
+    return {"median_ms": runs[len(runs) // 2] * 1e3, "min_ms": runs[0] * 1e3}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("fixtures", nargs="*", type=Path)
+    ap.add_argument("--repeats", type=int, default=50)
+    args = ap.parse_args()
+    fixtures = args.fixtures or sorted(ROOT.glob("debug_stage_*.html")) + [ROOT / "ans.html"]
+    s = bse_scraper_2()
+
+    def soup_inputs(html):
+        soup = bs4.BeautifulSoup(html, "lxml")
+        inputs = s._collect_inputs(soup)
+        settlement = s._get_settlement_value(soup)
+        if settlement is not None:
+            inputs["ctl00$ContentPlaceHolder1$ddlsetllementcal"] = settlement
+        return inputs
+
+    out, ok = {}, True
+    for fixture in fixtures:
+        html = fixture.read_text(encoding="utf-8")
+        fast_inputs, slow_inputs = s._fast_inputs(html), soup_inputs(html)
+        identical = fast_inputs == slow_inputs
+        ok &= identical or fast_inputs is None ## None: no tokens, _harvest_inputs takes the soup path
+        fast, slow = _time(lambda: s._fast_inputs(html), args.repeats), _time(lambda: soup_inputs(html), args.repeats)
+        out[fixture.name] = {
+            "bytes": len(html.encode("utf-8")),
+            "inputs": len(slow_inputs),
+            "identical": identical if fast_inputs is not None else "fallback",
+            "regex": fast,
+            "soup": slow,
+            "speedup": slow["median_ms"] / fast["median_ms"],
+        }
+    print(json.dumps(out, indent=2))
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Regression check for month ranges that cross year boundaries.
+
+    python benchmarks/year_boundary.py
+
+Fetches from Nov 2023 against the stand-in's serve_history with months_per_post None, 1, 2
+and 5, with and without a server cap on the months per response (truncated responses),
+with parallel_windows on and off, and for histories that start or end at a year boundary.
+Every case must give one row per month from the first month with data to the last,
+in order and without duplicates; a second fetch on the same scraper (windows planned from
+the learned cap) must give the same. Prints one line per case, exits 1 if any failed.
+"""
+import contextlib
+import datetime as dt
+import io
+import itertools
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from bse_scraper_v2 import bse_scraper_2
+from bse_store import index_to_label, label_to_index, month_index
+from benchmarks.stand_in_server import serve_history, start_server
+
+FROM = (11, 2023)
+## (first, last) month of the history the stand-in has; None: up to the current month
+HISTORIES = (("Jan 10", None), ("Feb 24", None), ("Jan 10", "Dec 24"), ("Dec 23", "Jan 25"))
+MONTHS_PER_POST = (None, 1, 2, 5)
+CAPS = (None, 3, 12)
+
+
+def expected(first, last):
+    """ The labels a fetch from FROM should give for a history from first to last"""
+    today = dt.date.today()
+    hi = label_to_index(last) if last else month_index(today.month, today.year)
+    return [index_to_label(p) for p in range(max(label_to_index(first), month_index(*FROM)), hi + 1)]
+
+
+def check(labels, want):
+    """ None if labels is want, else what is wrong"""
+    if labels == want:
+        return None
+    periods = [label_to_index(label) for label in labels]
+    if len(set(periods)) != len(periods):
+        return "duplicate months"
+    if periods != sorted(periods):
+        return "out of order"
+    missing = sorted(set(want) - set(labels), key=label_to_index)
+    if missing:
+        return f"missing {', '.join(missing[:6])}{' ...' if len(missing) > 6 else ''}"
+    return f"unexpected {', '.join(sorted(set(labels) - set(want), key=label_to_index)[:6])}"
+
+
+def main():
+    failed = 0
+    for (first, last), step, cap, parallel in itertools.product(HISTORIES, MONTHS_PER_POST, CAPS, (True, False)):
+        server, base_url = start_server()
+        serve_history(server, first, last, months_per_response=cap)
+        scraper = bse_scraper_2(rate_per_host=1e6)
+        scraper.base_url = base_url
+        scraper.months_per_post = step
+        scraper.parallel_windows = parallel
+        want = expected(first, last)
+        problems = []
+        for run in ("first", "again"):
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    df = scraper._fetch_until_today(500400, *FROM)
+                problem = check(df["Quarter End"].tolist(), want)
+            except Exception as e:
+                problem = repr(e)
+            if problem:
+                problems.append(f"{run}: {problem}")
+        server.shutdown()
+        failed += bool(problems)
+        case = f"history {first}..{last or 'now'} months_per_post={step} cap={cap} parallel={parallel}"
+        print(f"{'FAIL' if problems else 'ok  '} {case}" + (f" ({'; '.join(problems)})" if problems else ""))
+    print(f"{failed} failed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
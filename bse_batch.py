@@ -0,0 +1,176 @@
+"""
+Batch refresh of many scrips into the local store, across a pool of processes.
+
+    python bse_batch.py codes.txt --from-year 2010 --workers 8 --store bse_store.sqlite
+
+A run started again skips the scrips its checkpoint has as ok; exits 1 if any scrip failed.
+"""
+import argparse
+import datetime as dt
+import json
+import os
+import signal
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, List, Optional
+
+## the worker process' router, built by _init_worker
+_ROUTER = None
+
+
+def read_codes(path) -> List[str]:
+    """ Scrip codes from a text or CSV file, in file order without repeats"""
+    codes = []
+    for line in Path(path).read_text().splitlines():
+        first = line.split("#", 1)[0].split(",", 1)[0].strip().strip('"')
+        if first.isdigit():
+            codes.append(first)
+    return list(dict.fromkeys(codes))
+
+
+def read_checkpoint(path) -> Dict[str, dict]:
+    """ code -> result line of every scrip the checkpoint has; a torn last line is ignored"""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            done[entry["code"]] = entry
+    return done
+
+
+def _init_worker(store_path: str, scrips_path: Optional[str], rate: float, max_per_host: int, strategies, base_url: Optional[str]):
+    global _ROUTER
+    ## Ctrl-C is for the parent, which cancels what has not started; chunks in flight finish
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from bse_router import strategy_router
+    from bse_scraper_v2 import bse_scraper_2
+    from bse_scrips import scrip_master
+    from bse_store import monthly_store
+
+    scraper = bse_scraper_2(max_per_host=max_per_host, store=monthly_store(store_path), rate_per_host=rate,
+                            scrips=scrip_master(scrips_path) if scrips_path else None)
+    if base_url:
+        scraper.base_url = base_url
+    _ROUTER = strategy_router(scraper, strategies=strategies)
+
+
+def _refresh_one(code: str, from_month: int, from_year: int) -> dict:
+    scrips = _ROUTER.scraper.scrips
+    t0 = time.perf_counter()
+    try:
+        if scrips is not None and scrips.complete and code not in scrips:
+            raise ValueError("not in the scrip master")
+        if scrips is not None and code in scrips and scrips.get(code).delisted:
+            raise ValueError("delisted")
+        df = _ROUTER.fetch_until_today(code, from_month, from_year)
+        return {"code": code, "ok": True, "months": len(df), "strategy": df.attrs.get("strategy"),
+                "seconds": round(time.perf_counter() - t0, 3)}
+    except Exception as e:
+        return {"code": code, "ok": False, "error": repr(e), "seconds": round(time.perf_counter() - t0, 3)}
+
+
+def _refresh_chunk(codes: List[str], from_month: int, from_year: int) -> List[dict]:
+    """ Runs in a worker process: the chunk's scrips concurrently, their months saved to the store"""
+    with ThreadPoolExecutor(max_workers=len(codes)) as pool:
+        return list(pool.map(lambda code: _refresh_one(code, from_month, from_year), codes))
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("codes", help="file with one scrip code per line")
+    ap.add_argument("--from-month", type=int, default=1)
+    ap.add_argument("--from-year", type=int, default=2010)
+    ap.add_argument("--store", default=os.environ.get("BSE_STORE_PATH", "bse_store.sqlite"))
+    ap.add_argument("--scrips", default=os.environ.get("BSE_SCRIPS_PATH"), help="scrip master, skips unknown/delisted codes")
+    ap.add_argument("--checkpoint", help="default: <codes>.checkpoint.jsonl")
+    ap.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="processes")
+    ap.add_argument("--chunk", type=int, default=4, help="scrips in flight per process")
+    ap.add_argument("--rate", type=float, default=5.0, help="requests per second to BSE, all processes together")
+    ap.add_argument("--browser", action="store_true", help="allow the Playwright fallback (slow)")
+    ap.add_argument("--max-minutes", type=float, help="stop handing out scrips after this long; run again to resume")
+    ap.add_argument("--base-url", help=argparse.SUPPRESS) ## the stand-in server, for benchmarks
+    args = ap.parse_args(argv)
+
+    checkpoint = args.checkpoint or f"{args.codes}.checkpoint.jsonl"
+    if args.restart and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    codes = read_codes(args.codes)
+    done = read_checkpoint(checkpoint)
+    todo = [c for c in codes if not done.get(c, {}).get("ok")]
+    retry = sum(c in done for c in todo)
+    print(f"[INFO] {len(codes)} scrips, {len(codes) - len(todo)} already done in {checkpoint}, {len(todo)} to fetch"
+          + (f" ({retry} failed before)" if retry else ""))
+
+    strategies = ("post", "download", "browser") if args.browser else ("post", "download")
+    chunks = [todo[i:i + args.chunk] for i in range(0, len(todo), args.chunk)]
+    deadline = time.monotonic() + args.max_minutes * 60 if args.max_minutes else None
+    t0 = time.monotonic()
+    finished = failed = 0
+    stopped = False
+
+    pool = ProcessPoolExecutor(
+        max_workers=args.workers,
+        initializer=_init_worker,
+        initargs=(args.store, args.scrips, args.rate / args.workers, args.chunk, strategies, args.base_url),
+    )
+    try:
+        with open(checkpoint, "a") as log:
+            pending, queued = set(), iter(chunks)
+            while True:
+                ## keep one extra chunk queued per process so none of them idles between chunks
+                while not stopped and len(pending) < 2 * args.workers:
+                    if deadline is not None and time.monotonic() > deadline:
+                        print("[WARN] Out of time, run again to resume from the checkpoint")
+                        stopped = True
+                        break
+                    chunk = next(queued, None)
+                    if chunk is None:
+                        break
+                    pending.add(pool.submit(_refresh_chunk, chunk, args.from_month, args.from_year))
+                if not pending:
+                    break
+                complete, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in complete:
+                    for entry in fut.result():
+                        log.write(json.dumps(entry) + "\n")
+                        finished += 1
+                        failed += not entry["ok"]
+                        if not entry["ok"]:
+                            print(f"[WARN] Scrip {entry['code']} failed: {entry['error']}")
+                    log.flush()
+                    os.fsync(log.fileno())
+                elapsed = time.monotonic() - t0
+                rate = finished / elapsed if elapsed else 0.0
+                eta = (len(todo) - finished) / rate if rate else float("inf")
+                print(f"[INFO] {finished}/{len(todo)} done, {failed} failed, {rate:.1f} scrips/s, eta {dt.timedelta(seconds=int(eta)) if rate else '?'}")
+    except KeyboardInterrupt:
+        print("[WARN] Interrupted, run again to resume from the checkpoint")
+        pool.shutdown(wait=False, cancel_futures=True)
+        return 130
+    pool.shutdown()
+
+    if stopped:
+        return 1
+    results = read_checkpoint(checkpoint)
+    bad = [code for code in codes if not results.get(code, {}).get("ok")]
+    print(f"[INFO] Finished: {len(codes) - len(bad)} ok, {len(bad)} failed" + (f" ({', '.join(bad[:20])}{' ...' if len(bad) > 20 else ''})" if bad else ""))
+    if bad:
+        ## the checkpoint stays, the next run only retries these
+        print("[INFO] Run again to retry the failed scrips, or with --restart to refresh all of them")
+        return 1
+    ## every code is done: the next run starts over
+    stem, ext = os.path.splitext(checkpoint)
+    os.replace(checkpoint, f"{stem}.done{ext}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
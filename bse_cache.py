@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import datetime as dt
+import threading
+from typing import Optional
+
+from cachetools import TTLCache
+
+import bse_metrics
+from bse_lazy import lazy
+from bse_frames import by_month, month_indices
+from bse_store import month_index, month_from_index
+
+pd = lazy("pandas")
+
+
+def _frame_bytes(entry) -> int:
+    return int(entry[1].memory_usage(deep=True).sum()) + 64
+
+
+def _current_month() -> int:
+    today = dt.date.today()
+    return month_index(today.month, today.year)
+
+
+def _periods(df: pd.DataFrame) -> pd.Series:
+    """ Month index per row; -1 for labels that are not months (they sort as closed)"""
+    return pd.Series(month_indices(df["Quarter End"]), index=df.index, dtype="int64")
+
+
+class result_cache:
+    """ Process-wide cache of monthly closes per (scrip, from_month, from_year): closed months for closed_ttl seconds, the open month for open_ttl"""
+
+    def __init__(self, closed_ttl: float = 12 * 3600, open_ttl: float = 300, max_bytes: int = 64 * 1024 * 1024):
+        ## entries are (month index of the open month when fetched, frame)
+        self._closed = TTLCache(maxsize=max_bytes, ttl=closed_ttl, getsizeof=_frame_bytes)
+        self._open = TTLCache(maxsize=max(1, max_bytes // 8), ttl=open_ttl, getsizeof=_frame_bytes)
+        self._lock = threading.Lock()
+
+    def _key(self, scrip, from_month: int, from_year: int) -> tuple:
+        return (str(scrip).strip(), int(from_month), int(from_year))
+
+    def peek(self, scrip, from_month: int, from_year: int) -> Optional[pd.DataFrame]:
+        """ Cached result if both parts are fresh, without fetching"""
+        key = self._key(scrip, from_month, from_year)
+        current = _current_month()
+        with self._lock:
+            closed, opened = self._closed.get(key), self._open.get(key)
+        if closed is None or opened is None or closed[0] != current or opened[0] != current:
+            return None
+        return pd.concat([closed[1], opened[1]], ignore_index=True)
+
+    def put(self, scrip, from_month: int, from_year: int, df: pd.DataFrame) -> None:
+        """ Split a freshly fetched result into its closed and open parts"""
+        key = self._key(scrip, from_month, from_year)
+        current = _current_month()
+        is_closed = (_periods(df) < current).to_numpy(dtype=bool)
+        with self._lock:
+            try:
+                self._closed[key] = (current, df[is_closed].reset_index(drop=True))
+                self._open[key] = (current, df[~is_closed].reset_index(drop=True))
+            except ValueError:
+                ## a single result larger than the whole cache is simply not cached
+                self._closed.pop(key, None)
+
+    def get_or_fetch(self, fetch, scrip, from_month: int, from_year: int) -> pd.DataFrame:
+        """ fetch(scrip, from_month, from_year) -> monthly frame, called only for what is missing"""
+        hit = self.peek(scrip, from_month, from_year)
+        if hit is not None:
+            bse_metrics.count("bse_cache_total", cache="results", result="hit")
+            return hit
+
+        key = self._key(scrip, from_month, from_year)
+        current = _current_month()
+        with self._lock:
+            closed = self._closed.get(key)
+
+        bse_metrics.count("bse_cache_total", cache="results", result="miss" if closed is None else "partial")
+        if closed is None:
+            df = fetch(scrip, from_month, from_year)
+            self.put(scrip, from_month, from_year, df)
+            return df.copy()
+
+        ## closed months are still good; re-fetch from the month that was open when they were cached
+        since, closed_df = closed
+        newer = fetch(scrip, *month_from_index(min(since, current)))
+        newer = newer[(_periods(newer) >= since).to_numpy(dtype=bool)]
+        df = pd.concat([closed_df, newer], ignore_index=True)
+        self.put(scrip, from_month, from_year, df)
+        return df
+
+    def iter_or_fetch(self, iterate, scrip, from_month: int, from_year: int):
+        """ get_or_fetch yielding frames: cached closed months first, then only the newer chunks of iterate(scrip, from_month, from_year)"""
+        hit = self.peek(scrip, from_month, from_year)
+        if hit is not None:
+            bse_metrics.count("bse_cache_total", cache="results", result="hit")
+            yield hit
+            return
+
+        key = self._key(scrip, from_month, from_year)
+        current = _current_month()
+        with self._lock:
+            closed = self._closed.get(key)
+
+        bse_metrics.count("bse_cache_total", cache="results", result="miss" if closed is None else "partial")
+        chunks = []
+        if closed is None:
+            since = None
+            newer = iterate(scrip, from_month, from_year)
+        else:
+            since, closed_df = closed
+            chunks.append(closed_df)
+            yield closed_df.copy()
+            newer = iterate(scrip, *month_from_index(min(since, current)))
+
+        for chunk in newer:
+            if since is not None:
+                chunk = chunk[(_periods(chunk) >= since).to_numpy(dtype=bool)].reset_index(drop=True)
+                if chunk.empty:
+                    continue
+            chunks.append(chunk)
+            yield chunk.copy()
+
+        if chunks:
+            df = by_month(pd.concat(chunks, ignore_index=True))
+        else:
+            df = pd.DataFrame({"Quarter End": pd.Series(dtype="object"), "Close": pd.Series(dtype="float64")})
+        self.put(scrip, from_month, from_year, df)
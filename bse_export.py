@@ -0,0 +1,102 @@
+""" Typed Arrow IPC / Parquet export of closes as (scrip, period months since 1970-01, close)"""
+from pathlib import Path
+from typing import Mapping, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from bse_frames import format_periods, normalize_monthly
+
+SCHEMA = pa.schema(
+    [
+        pa.field("scrip", pa.dictionary(pa.int32(), pa.string()), nullable=False),
+        pa.field("period", pa.int32(), nullable=False),
+        pa.field("close", pa.float64()),
+    ],
+    metadata={b"period": b"months since 1970-01 (pandas period[M] ordinal)"},
+)
+MEDIA_TYPES = {
+    "arrow": "application/vnd.apache.arrow.file",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def to_table(frames: Union[pd.DataFrame, Mapping[str, pd.DataFrame]], scrip_col: str = "Scrip Code",
+             month_col: str = "Quarter End", close_col: str = "Close") -> pa.Table:
+    """ Closes to a SCHEMA table, from a long frame like _fetch_many's or a {scrip: monthly frame} mapping"""
+    if isinstance(frames, Mapping):
+        ## stitch the columns as plain arrays, concatenating thousands of small frames is slow
+        parts = {str(scrip): df for scrip, df in frames.items() if len(df)}
+        frames = pd.DataFrame({
+            scrip_col: np.repeat(np.asarray(list(parts), dtype=object), [len(df) for df in parts.values()]),
+            month_col: np.concatenate([df[month_col].to_numpy(dtype=object) for df in parts.values()] or [[]]),
+            close_col: np.concatenate([df[close_col].to_numpy(dtype=object) for df in parts.values()] or [[]]),
+        })
+
+    norm = normalize_monthly(frames[[scrip_col, month_col, close_col]], month_col=month_col, close_col=close_col)
+    codes, scrips = pd.factorize(norm[scrip_col].astype(str).str.strip(), sort=True)
+    periods = norm["Period"].array.asi8
+    order = np.lexsort((periods, codes))
+
+    scrip = pa.DictionaryArray.from_arrays(
+        pa.array(codes[order].astype(np.int32), type=pa.int32()),
+        pa.array(np.asarray(scrips, dtype=object), type=pa.string()),
+    )
+    return pa.Table.from_arrays(
+        [scrip, pa.array(periods[order].astype(np.int32)), pa.array(norm["Close"].to_numpy()[order])],
+        schema=SCHEMA,
+    )
+
+
+def to_frame(table: pa.Table, labels: bool = False) -> pd.DataFrame:
+    """ Table back to pandas: scrip as category, period as period[M] (or 'Mar 24' labels with labels=True)"""
+    df = table.to_pandas()
+    periods = pd.Series(pd.PeriodIndex.from_ordinals(df["period"].to_numpy(dtype="int64"), freq="M"), index=df.index)
+    df["period"] = format_periods(periods) if labels else periods
+    return df
+
+
+def to_bytes(table: pa.Table, fmt: str = "parquet") -> bytes:
+    """ Whole file in memory, for download buttons and HTTP responses"""
+    sink = pa.BufferOutputStream()
+    _write(table, sink, fmt)
+    return sink.getvalue().to_pybytes()
+
+
+def _format(path) -> str:
+    return "parquet" if Path(path).suffix.lower() in (".parquet", ".pq") else "arrow"
+
+
+def _write(table: pa.Table, sink, fmt: str) -> None:
+    if fmt == "parquet":
+        pq.write_table(table, sink, compression="zstd")
+    elif fmt == "arrow":
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        raise ValueError(f"Unknown export format {fmt!r}, expected 'arrow' or 'parquet'")
+
+
+def write(table: pa.Table, path) -> Path:
+    """ Write to path; .parquet/.pq files are Parquet, anything else an Arrow IPC file"""
+    path = Path(path)
+    _write(table, str(path), _format(path))
+    return path
+
+
+def read(path, memory_map: bool = True, scrips=None) -> pa.Table:
+    """ Read a file written by write(), Arrow memory-mapped; scrips keeps only those codes"""
+    path = Path(path)
+    wanted = None if scrips is None else [str(s).strip() for s in scrips]
+    if _format(path) == "parquet":
+        filters = None if wanted is None else [("scrip", "in", wanted)]
+        return pq.read_table(path, memory_map=memory_map, filters=filters)
+
+    source = pa.memory_map(str(path), "r") if memory_map else pa.OSFile(str(path), "rb")
+    table = pa.ipc.open_file(source).read_all()
+    if wanted is not None:
+        table = table.filter(pc.is_in(table["scrip"].cast(pa.string()), value_set=pa.array(wanted)))
+    return table
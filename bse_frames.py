@@ -0,0 +1,86 @@
+""" Vectorized normalization of BSE monthly frames, and the one place month labels are parsed"""
+from __future__ import annotations
+
+import re
+
+from bse_lazy import lazy
+
+np = lazy("numpy")
+pd = lazy("pandas")
+
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+_MONTH_NUMBER = {m: i for i, m in enumerate(MONTHS)}
+_LABEL = r"^\s*([A-Za-z]{3})\s+(\d{2,4})\s*$"
+MONTH_LABEL = re.compile(_LABEL)
+## month index (year * 12 + month - 1) of period[M] ordinal 0, Jan 1970
+EPOCH = 1970 * 12
+
+
+def month_ordinals(labels: pd.Series) -> np.ndarray:
+    """ Months since Jan 1970 (pandas' period[M] ordinal) per label, -1 where it is not a month"""
+    codes, uniques = pd.factorize(labels.astype(str), use_na_sentinel=True)
+    parts = pd.Series(uniques, dtype="object").str.extract(_LABEL)
+    month = parts[0].str.title().map(_MONTH_NUMBER)
+    year = pd.to_numeric(parts[1], errors="coerce")
+    year = year.where(year >= 100, year + 2000)
+    ordinals = ((year - 1970) * 12 + month).fillna(-1).to_numpy(dtype="int64")
+    return np.where(codes >= 0, ordinals[np.maximum(codes, 0)] if len(ordinals) else -1, -1)
+
+
+def month_indices(labels: pd.Series) -> np.ndarray:
+    """ Month index (bse_store.month_index: months since year 0) per label, -1 where it is not a month"""
+    ordinals = month_ordinals(labels)
+    return np.where(ordinals >= 0, ordinals + EPOCH, -1)
+
+
+def label_index(label: str) -> int:
+    """ One 'Mar 24' / 'Mar 2024' label -> month index; ValueError if it is not a month"""
+    m = MONTH_LABEL.match(str(label))
+    month = _MONTH_NUMBER.get(m.group(1).title()) if m else None
+    if month is None:
+        raise ValueError(f"Not a month label: {label!r}")
+    year = int(m.group(2))
+    return (year + 2000 if year < 100 else year) * 12 + month
+
+
+def by_month(df: pd.DataFrame, month_col: str = "Quarter End") -> pd.DataFrame:
+    """ Rows sorted oldest month first (stable; labels that are not months go first)"""
+    order = np.argsort(month_ordinals(df[month_col]), kind="stable")
+    return df.iloc[order].reset_index(drop=True)
+
+
+def to_float(values: pd.Series) -> pd.Series:
+    """ Close column as float64, '2,976.80' style strings included"""
+    if pd.api.types.is_float_dtype(values):
+        return values.astype("float64")
+    return pd.to_numeric(values.astype(str).str.replace(",", "", regex=False), errors="coerce").astype("float64")
+
+
+def normalize_monthly(df: pd.DataFrame, month_col: str = "Quarter End", close_col: str = "Close") -> pd.DataFrame:
+    """ Replace the month label and close columns by 'Period' (period[M]) and 'Close' (float64), dropping rows that are not months"""
+    ordinals = month_ordinals(df[month_col])
+    valid = ordinals >= 0
+    out = df.loc[valid].drop(columns=[month_col, close_col])
+    out.insert(0, "Period", pd.PeriodIndex.from_ordinals(ordinals[valid], freq="M"))
+    out.insert(1, "Close", to_float(df.loc[valid, close_col]).to_numpy())
+    return out.reset_index(drop=True)
+
+
+def is_quarter_end(periods: pd.Series) -> np.ndarray:
+    """ Mar/Jun/Sep/Dec mask on a period[M] column"""
+    ordinals = periods.array.asi8
+    return (ordinals % 12) % 3 == 2
+
+
+def quarter_ends(norm: pd.DataFrame, ascending: bool = True, by_scrip: str = None) -> pd.DataFrame:
+    """ Quarter-end rows of a normalized frame, sorted by period (within by_scrip when given)"""
+    out = norm.loc[is_quarter_end(norm["Period"])]
+    keys = ([by_scrip] if by_scrip else []) + ["Period"]
+    return out.sort_values(keys, ascending=ascending, kind="stable").reset_index(drop=True)
+
+
+def format_periods(periods: pd.Series, style: str = "%b %y") -> pd.Series:
+    """ Period column back to labels ('%b %y' -> 'Mar 24'), formatting each distinct month once"""
+    codes, uniques = pd.factorize(periods)
+    labels = np.asarray(pd.PeriodIndex(uniques, freq="M").strftime(style), dtype=object)
+    return pd.Series(labels[codes] if len(labels) else np.array([], dtype=object), index=periods.index, dtype="object")
@@ -0,0 +1,30 @@
+""" Deferred imports for the heavy dependencies: pd = lazy("pandas") imports pandas on first attribute use"""
+import importlib
+import threading
+import types
+
+_LOCK = threading.Lock()
+
+
+class _lazy_module(types.ModuleType):
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_lazy_target"] = name
+
+    def __getattr__(self, attr: str):
+        if attr.startswith("__") and attr.endswith("__"):
+            ## introspection (copy, pickle, doc tools) should not trigger the import
+            raise AttributeError(attr)
+        with _LOCK:
+            module = importlib.import_module(self._lazy_target)
+            ## later lookups hit the copied namespace directly, __getattr__ only sees misses
+            self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+    def __repr__(self) -> str:
+        return f"<lazy module {self._lazy_target!r}>"
+
+
+def lazy(name: str) -> types.ModuleType:
+    """ Module proxy for name, imported on first attribute access"""
+    return _lazy_module(name)
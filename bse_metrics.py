@@ -0,0 +1,222 @@
+""" Instrumentation hooks shared by bse_scraper_2 and Scraper_bse: span(), count() and observe() go to every registered sink"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+_HOOKS: List["hooks"] = []
+
+_HELP = {
+    "bse_stage_seconds": "Time spent per pipeline stage",
+    "bse_http_seconds": "Connection phases of HTTP requests to BSE",
+    "bse_requests_total": "HTTP requests sent to BSE",
+    "bse_bytes_total": "Bytes sent to and received from BSE",
+    "bse_cache_total": "Cache lookups by cache and result",
+    "bse_retries_total": "Requests retried after a failure",
+    "bse_breaker_total": "Circuit breaker events",
+    "bse_strategy_total": "Fetch strategies tried by the router",
+}
+
+## httpx/httpcore trace events -> bse_http_seconds phase
+_HTTP_PHASES = {
+    "connection.connect_tcp": "connect",
+    "connection.start_tls": "tls",
+    "http11.receive_response_headers": "server_wait",
+    "http2.receive_response_headers": "server_wait",
+}
+
+
+class hooks:
+    """ Sink interface, every method is optional. labels are plain {str: str} dicts."""
+
+    def start_span(self, stage: str, labels: Dict[str, str]):
+        """ Called when a stage starts; the return value comes back in end_span"""
+        return None
+
+    def end_span(self, token, stage: str, labels: Dict[str, str], seconds: float, error: Optional[BaseException]) -> None:
+        pass
+
+    def count(self, name: str, value: float, labels: Dict[str, str]) -> None:
+        pass
+
+    def observe(self, name: str, value: float, labels: Dict[str, str]) -> None:
+        pass
+
+
+def register(sink: hooks) -> hooks:
+    if sink not in _HOOKS:
+        _HOOKS.append(sink)
+    return sink
+
+
+def unregister(sink: hooks) -> None:
+    if sink in _HOOKS:
+        _HOOKS.remove(sink)
+
+
+def enabled() -> bool:
+    return bool(_HOOKS)
+
+
+@contextmanager
+def span(stage: str, **labels):
+    """ Time the with-block as one stage"""
+    if not _HOOKS:
+        yield
+        return
+    sinks = list(_HOOKS)
+    labels = {k: str(v) for k, v in labels.items()}
+    tokens = [sink.start_span(stage, labels) for sink in sinks]
+    t0 = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        seconds = time.perf_counter() - t0
+        for sink, token in zip(reversed(sinks), reversed(tokens)):
+            sink.end_span(token, stage, labels, seconds, error)
+
+
+def count(name: str, value: float = 1, **labels) -> None:
+    if _HOOKS:
+        labels = {k: str(v) for k, v in labels.items()}
+        for sink in list(_HOOKS):
+            sink.count(name, value, labels)
+
+
+def observe(name: str, value: float, **labels) -> None:
+    if _HOOKS:
+        labels = {k: str(v) for k, v in labels.items()}
+        for sink in list(_HOOKS):
+            sink.observe(name, value, labels)
+
+
+def httpx_trace():
+    """ Async callback for httpx's trace extension, reporting connect / tls / server_wait times"""
+    started: Dict[str, float] = {}
+
+    async def trace(event: str, info: dict) -> None:
+        name, _, step = event.rpartition(".")
+        phase = _HTTP_PHASES.get(name)
+        if phase is None:
+            return
+        if step == "started":
+            started[name] = time.perf_counter()
+        elif name in started:
+            observe("bse_http_seconds", time.perf_counter() - started.pop(name), phase=phase)
+
+    return trace
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _label_text(labels, extra: str = "") -> str:
+    parts = [f'{k}="{_escape(v)}"' for k, v in labels] + ([extra] if extra else [])
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class prometheus_hooks(hooks):
+    """ Counters and histograms kept in memory, rendered in the Prometheus text format"""
+
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counters: Dict[tuple, float] = {}
+        self._histograms: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def end_span(self, token, stage, labels, seconds, error):
+        self.observe("bse_stage_seconds", seconds, {"stage": stage, **labels, "outcome": "error" if error else "ok"})
+
+    def count(self, name, value, labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            ## per bucket counts (not cumulative) + the +Inf bucket, then sum
+            hist = self._histograms.setdefault(key, [0] * (len(self.buckets) + 1) + [0.0])
+            idx = next((i for i, le in enumerate(self.buckets) if value <= le), len(self.buckets))
+            hist[idx] += 1
+            hist[-1] += value
+
+    def render(self) -> str:
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((k, list(v)) for k, v in self._histograms.items())
+
+        lines, typed = [], set()
+
+        def header(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# HELP {name} {_HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            header(name, "counter")
+            lines.append(f"{name}{_label_text(labels)} {_number(value)}")
+
+        for (name, labels), hist in histograms:
+            header(name, "histogram")
+            running = 0
+            for le, n in zip(self.buckets + (float("inf"),), hist[:-1]):
+                running += n
+                le_label = 'le="' + ("+Inf" if le == float("inf") else f"{le:g}") + '"'
+                lines.append(f"{name}_bucket{_label_text(labels, le_label)} {running}")
+            lines.append(f"{name}_sum{_label_text(labels)} {_number(hist[-1])}")
+            lines.append(f"{name}_count{_label_text(labels)} {running}")
+        return "\n".join(lines) + "\n"
+
+
+class otel_hooks(hooks):
+    """ Spans and metrics through the OpenTelemetry API (the global providers unless given)"""
+
+    def __init__(self, tracer_provider=None, meter_provider=None):
+        ## optional dependency, only needed when this adapter is used
+        from opentelemetry import context, metrics, trace
+
+        self._context = context
+        self._trace = trace
+        self._tracer = trace.get_tracer("bse_scraper", tracer_provider=tracer_provider)
+        self._meter = metrics.get_meter("bse_scraper", meter_provider=meter_provider)
+        self._instruments: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _instrument(self, name: str, histogram: bool):
+        with self._lock:
+            if name not in self._instruments:
+                make = self._meter.create_histogram if histogram else self._meter.create_counter
+                self._instruments[name] = make(name, unit="s" if histogram else "1", description=_HELP.get(name, ""))
+            return self._instruments[name]
+
+    def start_span(self, stage, labels):
+        current = self._tracer.start_span(stage, attributes=labels)
+        return current, self._context.attach(self._trace.set_span_in_context(current))
+
+    def end_span(self, token, stage, labels, seconds, error):
+        current, attached = token
+        self._context.detach(attached)
+        if error is not None:
+            current.record_exception(error)
+            current.set_status(self._trace.Status(self._trace.StatusCode.ERROR))
+        current.end()
+        self.observe("bse_stage_seconds", seconds, {"stage": stage, **labels})
+
+    def count(self, name, value, labels):
+        self._instrument(name, histogram=False).add(value, attributes=labels)
+
+    def observe(self, name, value, labels):
+        self._instrument(name, histogram=True).record(value, attributes=labels)
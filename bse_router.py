@@ -0,0 +1,153 @@
+""" Fallback chain post -> download -> browser that remembers per scrip which strategy last worked"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Dict, List, Optional
+
+import bse_metrics
+from bse_frames import to_float
+from bse_lazy import lazy
+from bse_scraper_v2 import bse_scraper_2
+from bse_store import month_index, monthly_store
+from bse_throttle import RETRY_STATUSES, circuit_open
+
+httpx = lazy("httpx")
+pd = lazy("pandas")
+
+STRATEGIES = ("post", "download", "browser")
+
+
+def _host_trouble(e: BaseException) -> bool:
+    """ True for errors another strategy against the same host would not get around"""
+    if isinstance(e, circuit_open):
+        return True
+    ## an error raised by httpx means httpx is loaded, the isinstance checks do not import it
+    if type(e).__module__.split(".")[0] != "httpx":
+        return False
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code in RETRY_STATUSES
+    return isinstance(e, httpx.TransportError)
+
+
+class strategy_router:
+    def __init__(self, scraper: Optional[bse_scraper_2] = None, browser=None, store: Optional[monthly_store] = None,
+                 strategies=STRATEGIES, recheck_after: float = 7 * 24 * 3600):
+        self.scraper = scraper or bse_scraper_2()
+        self.store = store if store is not None else self.scraper.store ## also where the memory is kept
+        self.strategies = tuple(strategies)
+        self.recheck_after = recheck_after
+        self._browser = browser ## Scraper_bse, started on the first scrip that needs it
+        self._memory: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        unknown = set(self.strategies) - set(STRATEGIES)
+        if unknown:
+            raise ValueError(f"Unknown strategies {sorted(unknown)}, expected some of {STRATEGIES}")
+
+    def remembered(self, scrip) -> Optional[str]:
+        """ The strategy that last worked for scrip, None if unknown or due for a recheck"""
+        if self.store is not None:
+            entry = self.store.last_strategy(scrip)
+        else:
+            entry = self._memory.get(str(scrip))
+        if entry is None or time.time() - entry[1] > self.recheck_after:
+            return None
+        return entry[0]
+
+    def _remember(self, scrip, name: str) -> None:
+        if self.store is not None:
+            self.store.remember_strategy(scrip, name)
+        else:
+            self._memory[str(scrip)] = (name, time.time())
+
+    def order(self, scrip) -> List[str]:
+        """ Strategies in the order they will be tried for scrip"""
+        first = self.remembered(scrip)
+        if first not in self.strategies:
+            return list(self.strategies)
+        return [first] + [s for s in self.strategies if s != first]
+
+    def fetch_until_today(self, scrip, from_month: int, from_year: int) -> pd.DataFrame:
+        """ Same result as bse_scraper_2._recurse_until_today; df.attrs["strategy"] names the one that worked"""
+        failures = []
+        remembered = self.remembered(scrip)
+        for name in self.order(scrip):
+            try:
+                with bse_metrics.span("strategy", strategy=name):
+                    df = self._run(name, scrip, from_month, from_year)
+            except Exception as e:
+                self._failed(name, scrip, e, failures)
+                continue
+            self._succeeded(name, scrip, remembered)
+            df.attrs["strategy"] = name
+            return df
+        raise RuntimeError(f"Every strategy failed for scrip code {scrip}: " + "; ".join(failures))
+
+    def iter_until_today(self, scrip, from_month: int, from_year: int):
+        """ fetch_until_today as a generator of frames, one per POST; a strategy failing halfway falls through without repeating months"""
+        failures = []
+        seen = set()
+        remembered = self.remembered(scrip)
+        for name in self.order(scrip):
+            try:
+                with bse_metrics.span("strategy", strategy=name):
+                    for df in self._iter(name, scrip, from_month, from_year):
+                        df = df[~df["Quarter End"].isin(seen)].reset_index(drop=True)
+                        if df.empty:
+                            continue
+                        seen.update(df["Quarter End"])
+                        yield df
+            except Exception as e:
+                self._failed(name, scrip, e, failures)
+                continue
+            self._succeeded(name, scrip, remembered)
+            return
+        raise RuntimeError(f"Every strategy failed for scrip code {scrip}: " + "; ".join(failures))
+
+    def _failed(self, name: str, scrip, e: Exception, failures: List[str]) -> None:
+        """ Count a failed attempt; errors no other strategy gets around are raised again"""
+        bse_metrics.count("bse_strategy_total", strategy=name, result="failed")
+        if _host_trouble(e):
+            raise e
+        print(f"[WARN] Strategy {name} failed for {scrip}: {e!r}")
+        failures.append(f"{name}: {e!r}")
+
+    def _succeeded(self, name: str, scrip, remembered: Optional[str]) -> None:
+        bse_metrics.count("bse_strategy_total", strategy=name, result="ok")
+        if name not in (remembered, self.strategies[0]):
+            print(f"[INFO] Using strategy {name} for {scrip} from now on")
+        self._remember(scrip, name)
+
+    def _run(self, name: str, scrip, from_month: int, from_year: int) -> pd.DataFrame:
+        if name == "browser":
+            return self.scraper._through_store(scrip, from_month, from_year, self._fetch_with_browser)
+        return self.scraper._recurse_until_today(scrip, from_month, from_year, strategy=name)
+
+    def _iter(self, name: str, scrip, from_month: int, from_year: int):
+        if name == "browser":
+            ## one page load gives the whole table, nothing to stream
+            return iter([self._run(name, scrip, from_month, from_year)])
+        return self.scraper._iter_recurse_until_today(scrip, from_month, from_year, strategy=name)
+
+    def _browser_scraper(self):
+        with self._lock:
+            if self._browser is None:
+                ## Playwright only loads once a scrip gets this far down the chain
+                from bse_scraper import Scraper_bse
+                self._browser = Scraper_bse(headless=True, verbose=False)
+        return self._browser
+
+    def _fetch_with_browser(self, scrip, from_month: int, from_year: int) -> pd.DataFrame:
+        """ Scraper_bse's monthly table in bse_scraper_2's shape: 'Quarter End' labels, float Close, oldest first"""
+        ## the browser flow only picks a year, the months before from_month are dropped here
+        monthly = self._browser_scraper()._fetch_monthly_data(scrip, from_year)
+        df = pd.DataFrame({"Quarter End": monthly["Month"].astype(str).str.strip(), "Close": to_float(monthly["Close"])})
+        df = self.scraper._with_periods(df)
+        df = df[df["__period"] >= month_index(from_month, from_year)]
+        df = df.drop_duplicates(subset="__period", keep="last").sort_values("__period")
+        return df.drop(columns="__period").reset_index(drop=True)
+
+    def close(self) -> None:
+        """ Shut down the browser and its thread, if the browser strategy ever ran"""
+        if self._browser is not None:
+            self._browser.close()
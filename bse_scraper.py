@@ -9,26 +9,223 @@ from __future__ import annotations
 #         pass
 import re
 from datetime import datetime, date
-import sys
-from typing import List, Dict, Any
-import numpy as np, pandas as pd
+import sys, os, gzip, uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional
 from io import StringIO
+from bse_frames import normalize_monthly, quarter_ends, format_periods
+import bse_metrics
+from bse_lazy import lazy
+
+## imported on first use: Playwright only loads once a browser is actually started
+np = lazy("numpy")
+pd = lazy("pandas")
 
 ## for scraping
-from bs4 import BeautifulSoup
-from playwright.sync_api import sync_playwright, TimeoutError as PWTimeoutError
+bs4 = lazy("bs4")
+sync_api = lazy("playwright.sync_api")
 
 ## imported to check whether BSE is responding
 import urllib.request, sys
 
 
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36"
+)
+
+
+class Browser_pool:
+    """ One long-lived Chromium with one warm page, used only from the thread that created it (Playwright sync API)"""
+
+    def __init__(self, max_uses: int = 25, headless: bool = True, verbose: bool = False):
+        self.max_uses = max_uses
+        self.headless = headless
+        self.verbose = verbose
+        self._owner = threading.get_ident()
+        self._pw = None
+        self._browser = None
+        self._idle: Optional[Dict[str, Any]] = None
+
+    def _ensure_browser(self):
+        if self._browser is not None and self._browser.is_connected():
+            return self._browser
+        ## the browser died (or never started): the warm context went with it
+        self._idle = None
+        if self._pw is None:
+            self._pw = sync_api.sync_playwright().start()
+        """The browser is being launched with additional arguments to enhance stability and compatibility, especially in containerized or restricted environments."""
+        self._browser = self._pw.chromium.launch(
+            headless=self.headless,
+            args = [
+                "--no-sandbox",
+                "--disable-setuid-sandbox",
+                "--disable-dev-shm-usage",
+                "--disable-gpu"
+            ]
+        )
+        return self._browser
+
+    def _new_slot(self) -> Dict[str, Any]:
+        context = self._ensure_browser().new_context(user_agent=USER_AGENT)
+        page = context.new_page()
+        # raise navigation timeout so we can see network/blocking issues in logs
+        page.set_default_navigation_timeout(180_000)
+        page.set_default_timeout(180_000)
+        return {"context": context, "page": page, "uses": 0}
+
+    def _healthy(self, slot) -> bool:
+        try:
+            return (
+                self._browser is not None and self._browser.is_connected()
+                and not slot["page"].is_closed()
+                and slot["page"].evaluate("() => 1") == 1
+            )
+        except Exception:
+            return False
+
+    def _discard(self, slot):
+        try:
+            slot["context"].close()
+        except Exception:
+            pass
+
+    @contextmanager
+    def checkout(self):
+        """ Yields a warm page with cleared cookies; the caller navigates it to the scrip's page"""
+        if threading.get_ident() != self._owner:
+            raise RuntimeError("Browser_pool used from a thread other than the one that created it")
+
+        slot, self._idle = self._idle, None
+        if slot is not None and not self._healthy(slot):
+            if self.verbose:
+                print("[INFO] Recycling unhealthy pooled browser context")
+            self._discard(slot)
+            slot = None
+        if slot is None:
+            slot = self._new_slot()
+
+        ## every request starts from a fresh WebForms session
+        slot["context"].clear_cookies()
+        ok = False
+        try:
+            yield slot["page"]
+            ok = True
+        finally:
+            slot["uses"] += 1
+            if ok and slot["uses"] < self.max_uses and self._idle is None:
+                self._idle = slot
+            else:
+                self._discard(slot)
+
+    def close(self):
+        if self._idle is not None:
+            self._discard(self._idle)
+            self._idle = None
+        if self._browser is not None:
+            try:
+                self._browser.close()
+            except Exception:
+                pass
+            self._browser = None
+        if self._pw is not None:
+            self._pw.stop()
+            self._pw = None
+
+
+class Debug_capture:
+    """ Opt-in gzip page snapshots, one file per request and stage, written by a background thread"""
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory
+        self._writer = None
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bse-debug-capture")
+
+    @property
+    def enabled(self) -> bool:
+        return self._writer is not None
+
+    def new_request_id(self, scrip_code) -> str:
+        return f"{datetime.now():%Y%m%dT%H%M%S}_{scrip_code}_{uuid.uuid4().hex[:8]}"
+
+    def hint(self) -> str:
+        """ Suffix for error messages pointing at the snapshots"""
+        return f" See the snapshots in {self.directory}." if self.enabled else " Set debug_dir (or BSE_DEBUG_DIR) to capture page snapshots."
+
+    def snapshot(self, request_id: str, stage: str, html_text: str) -> None:
+        if self.enabled:
+            self._writer.submit(self._write, f"{request_id}_{stage}.html.gz", html_text.encode("utf-8"), True)
+
+    def snapshot_bytes(self, request_id: str, name: str, data: bytes) -> None:
+        if self.enabled:
+            self._writer.submit(self._write, f"{request_id}_{name}", data, False)
+
+    def _write(self, fname: str, data: bytes, compress: bool) -> None:
+        path = os.path.join(self.directory, fname)
+        try:
+            if compress:
+                with gzip.open(path, "wb", compresslevel=5) as f:
+                    f.write(data)
+            else:
+                with open(path, "wb") as f:
+                    f.write(data)
+        except OSError as e:
+            print(f"[WARN] Could not write debug snapshot {path}: {e!r}", file=sys.stderr)
+
+    def close(self) -> None:
+        """ Flush pending snapshots"""
+        if self._writer is not None:
+            self._writer.shutdown(wait=True)
+            self._writer = None
+
+
 class Scraper_bse:
-    def __init__(self, headless: bool = True, verbose: bool = True):
+    def __init__(self, headless: bool = True, verbose: bool = True, pool_max_uses: int = 25, preflight: bool = False, debug_dir: Optional[str] = None):
         # self.base_url = "https://www.bseindia.com/markets/equity/EQReports/StockPrcHistori.html?flag=0"
         self.base_url = "https://www.bseindia.com/markets/equity/EQReports/StockPrcHistori.aspx?expandable=7&scripcode={code}&flag=sp&Submit=G"
         self.quarter_months = {"Mar", "Jun", "Sep", "Dec"}
         self.headless = headless
         self.verbose = verbose
+        self.pool_max_uses = pool_max_uses
+        self.preflight = preflight ## extra urllib request to check BSE is reachable, only for debugging
+        ## one long-lived thread owns the Chromium, whichever thread (Streamlit rerun, batch chunk) asks
+        self._browser_thread: Optional[ThreadPoolExecutor] = None
+        self._browser_pool: Optional[Browser_pool] = None
+        self._lock = threading.Lock()
+        ## page snapshots are opt-in: pass debug_dir or set BSE_DEBUG_DIR
+        self.debug = Debug_capture(debug_dir or os.environ.get("BSE_DEBUG_DIR"))
+
+    def _pool(self) -> Browser_pool:
+        """ The warm browser context, started on first use; only called on the browser thread"""
+        if self._browser_pool is None:
+            self._browser_pool = Browser_pool(self.pool_max_uses, self.headless, self.verbose)
+        return self._browser_pool
+
+    def _on_browser_thread(self, fn, *args):
+        """ Run fn(*args) on the browser thread and wait for it; fetches from several threads take turns"""
+        with self._lock:
+            if self._browser_thread is None:
+                self._browser_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bse-browser")
+            executor = self._browser_thread
+        return executor.submit(fn, *args).result()
+
+    def close(self):
+        """ Shut down the browser pool and its thread; the next fetch starts a new one"""
+        with self._lock:
+            executor, self._browser_thread = self._browser_thread, None
+        if executor is not None:
+            executor.submit(self._close_pool).result()
+            executor.shutdown(wait=True)
+        self.debug.close()
+
+    def _close_pool(self):
+        if self._browser_pool is not None:
+            self._browser_pool.close()
+            self._browser_pool = None
 
     def _pick_monthly_data(self, html:str)->pd.DataFrame:
         """
@@ -48,7 +245,7 @@ class Scraper_bse:
         
         ## If none of the found tables have these columns then we use the beautifulsoup
         if not candidates:
-            soup = BeautifulSoup(html, "lxml")
+            soup = bs4.BeautifulSoup(html, "lxml")
             for tbl in soup.find_all("table"):
                 if tbl.find(string = re.compile(r"Month", re.I)) and tbl.find(string = re.compile(r"Close", re.I)):
                     try:
@@ -59,9 +256,8 @@ class Scraper_bse:
                         print("Even beautiful soup could not find the table")
 
         if not candidates:
-            with open("debug_no_table.html", "w", encoding="utf-8") as f:
-                f.write(html)
-            raise RuntimeError("Monthly table not found. Saved debug_no_table.html")
+            self.debug.snapshot(self.debug.new_request_id("parse"), "no_table", html)
+            raise RuntimeError("Monthly table not found." + self.debug.hint())
 
         print(f"[DEBUG]: Our candidates that we got are the following:")
         for i, df in enumerate(candidates):
@@ -144,8 +340,11 @@ class Scraper_bse:
     def _fetch_monthly_data(self, scrip_code: int, from_year = 2024)->pd.DataFrame:
         """
         Use Playwright to load BSE page, switch to Monthly, set From year, submit,
-        and return the full monthly table as a DataFrame.
+        and return the full monthly table as a DataFrame. Runs on the browser thread.
         """
+        return self._on_browser_thread(self._load_monthly_data, scrip_code, from_year)
+
+    def _load_monthly_data(self, scrip_code: int, from_year = 2024)->pd.DataFrame:
         filled_url = self.base_url.format(code = str(scrip_code).strip())
 
         def _preflight(url):
@@ -162,12 +361,16 @@ class Scraper_bse:
         if self.verbose:
             print(f"[INFO] Navigating: {filled_url}")
 
-        def dump(stage, html_text):
-            fname = f"debug_stage_{stage}.html"
-            with open(fname, "w", encoding="utf-8") as f:
-                f.write(html_text)
-            if self.verbose:
-                print(f"[DEBUG] Saved {fname}")
+        request_id = self.debug.new_request_id(scrip_code)
+
+        def dump(stage):
+            ## page.content() serializes the whole DOM, only pay for it when capturing
+            if not self.debug.enabled:
+                return
+            try:
+                self.debug.snapshot(request_id, stage, page.content())
+            except Exception as e:
+                print(f"[WARN] Could not capture {stage}: {e!r}")
 
         ## using the playwright -- this is the old code
         # with sync_playwright() as p:
@@ -191,63 +394,44 @@ class Scraper_bse:
 
 
         ## updated new code with better error handling
-        """The browser is being launched with additional arguments to enhance stability and compatibility, especially in containerized or restricted environments."""
-        with sync_playwright() as p:
-            browser = p.chromium.launch(
-                headless=self.headless,
-                args = [
-                    "--no-sandbox",
-                    "--disable-setuid-sandbox",
-                    "--disable-dev-shm-usage",
-                    "--disable-gpu"
-                ]
-            )
+        """The page comes from one warm browser context (see Browser_pool) instead of a fresh Chromium per call."""
+        with self._pool().checkout() as page:
 
             try:
-                context = browser.new_context(user_agent=(
-                    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
-                    "(KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36"
-                ))
-                page = context.new_page()
-
-                # raise navigation timeout so we can see network/blocking issues in logs
-                page.set_default_navigation_timeout(180_000)
-                page.set_default_timeout(180_000)
-
-                print("[INFO] Performing preflight check...")
-                _preflight(filled_url)
+                if self.preflight:
+                    print("[INFO] Performing preflight check...")
+                    _preflight(filled_url)
 
-                try:
-                    page.goto(filled_url, wait_until="domcontentloaded")
-                except PWTimeoutError:
-
-                    ## now we have the logs to see what is happening when deployed
+                with bse_metrics.span("token_get", scraper="playwright"):
                     try:
-                        html = page.content()
-                        with open("Debug_timeout_goto.html", "w", encoding="utf-8") as f:
-                            f.write(html)
+                        ## resets the pooled page to the StockPrcHistori page of this scrip
+                        loaded = page.goto(filled_url, wait_until="domcontentloaded")
+                        if loaded is not None:
+                            bse_metrics.count("bse_requests_total", method="GET", status=loaded.status)
+                    except sync_api.TimeoutError:
+
+                        ## now we have the logs to see what is happening when deployed
+                        dump("timeout_goto")
+                        if self.debug.enabled:
+                            try:
+                                self.debug.snapshot_bytes(request_id, "timeout_goto.png", page.screenshot())
+                            except Exception:
+                                pass
 
-                    except Exception:
-                        pass
+                        raise RuntimeError(f"Timed out loading BSE page for scrip code {scrip_code}." + self.debug.hint())
 
+                    ## allow background activity
                     try:
-                        page.screenshot(path = "/tmp/Debug_timeout_goto.png")
+                        page.wait_for_load_state("networkidle", timeout=10_000)
                     except Exception:
                         pass
 
-                    browser.close()
-                    raise RuntimeError(f"Timed out loading BSE page for scrip code {scrip_code}. Saved Debug_timeout_goto.html")
-                
-                ## allow background activity
-                try:
-                    page.wait_for_load_state("networkidle", timeout=10_000)
-                except Exception:
-                    pass
-
+            except RuntimeError:
+                raise
             except Exception as e:
                 pass          
 
-            dump("initial", page.content())
+            dump("initial")
 
             ## select the monthly
             monthly_selected = False
@@ -274,7 +458,15 @@ class Scraper_bse:
             if not monthly_selected and self.verbose:
                 print("[WARN] Could not assert Monthly radio; continuing anyway.")
                 
-            page.wait_for_timeout(800) # Gather selects (may be created after radio selection / postback)
+            # Gather selects: ChangeDMYVal('M') enables the month/year dropdowns, wait for that instead of sleeping
+            try:
+                page.wait_for_function(
+                    "() => { const s = document.querySelector('#ContentPlaceHolder1_cmbMonthly'); return !s || !s.disabled; }",
+                    timeout=4000,
+                )
+            except sync_api.TimeoutError:
+                if self.verbose:
+                    print("[INFO] Month dropdown still disabled; continuing anyway.")
 
             ## assuming the first text box is for the month and the second is for the year
             selects = page.locator("select") ## this is the number of select tags -> click on the area-> click inspect and see the tags
@@ -285,7 +477,7 @@ class Scraper_bse:
                 if self.verbose:
                     print("[INFO] No selects at page root yet; will also search frames later.")
             
-            dump("after_radio", page.content())
+            dump("after_radio")
 
             def set_month_year(root):
                 got_month, got_year = False, False
@@ -345,7 +537,7 @@ class Scraper_bse:
                     except Exception:
                         continue
 
-            dump("after dropdowns", page.content())
+            dump("after_dropdowns")
             # Old method
             # counts = selects.count()
             # if counts>=2:
@@ -387,7 +579,7 @@ class Scraper_bse:
             # try:
             #     ## This will basically ensure that the table has been generated as it looks for a "Month" column
             #     page.wait_for_selector("table:has-text('Month')", timeout=15000)
-            # except PWTimeoutError:
+            # except sync_api.TimeoutError:
             #     # Save HTML for debugging
             #     html_debug = page.content()
             #     with open("debug_bse_page.html", "w", encoding="utf-8") as f:
@@ -404,49 +596,78 @@ class Scraper_bse:
                 "xpath=//input[@type='submit']",
                 "xpath=//button[contains(translate(., 'SUBMIT','submit'),'submit')]"
             ]
-            for sel in submit_selectors:
-                try:
-                    loc = page.locator(sel).first
-                    if loc.count():
-                        loc.click()
-                        submitted = True
-                        break
-                except Exception:
-                    continue
 
-            if not submitted:
-                # Try invoking ASP.NET __doPostBack if available
+            def is_postback(resp) -> bool:
+                return resp.request.method == "POST" and "StockPrcHistori" in resp.url
+
+            ## wait on the form POST itself instead of a fixed sleep
+            with bse_metrics.span("form_post", scraper="playwright"):
                 try:
-                    page.evaluate("() => { if (typeof __doPostBack === 'function') __doPostBack('', ''); }")
-                    submitted = True
-                except Exception:
-                    pass
+                    with page.expect_response(is_postback, timeout=60_000) as posted:
+                        for sel in submit_selectors:
+                            try:
+                                loc = page.locator(sel).first
+                                if loc.count():
+                                    loc.click()
+                                    submitted = True
+                                    break
+                            except Exception:
+                                continue
+
+                        if not submitted:
+                            # Try invoking ASP.NET __doPostBack if available
+                            try:
+                                page.evaluate("() => { if (typeof __doPostBack === 'function') __doPostBack('', ''); }")
+                                submitted = True
+                            except Exception:
+                                pass
+                except sync_api.TimeoutError:
+                    if self.verbose:
+                        print("[WARN] No postback response seen for the submit.")
+                else:
+                    bse_metrics.count("bse_requests_total", method="POST", status=posted.value.status)
+                    if bse_metrics.enabled():
+                        ## the body is already in the browser, this only copies it over
+                        try:
+                            bse_metrics.count("bse_bytes_total", len(posted.value.body()), direction="received")
+                        except Exception:
+                            pass
 
             if self.verbose:
                 print(f"[INFO] Submit triggered: {submitted}")
 
-            page.wait_for_timeout(1200)  # allow postback
-
-            dump("after_submit", page.content())
-
-            # Print a short page head to cloud logs so you can inspect remotely
+            ## the postback re-renders the page; the table is in the DOM once it is parsed
             try:
-                head = page.content()[:2000]
-                print("[DEBUG][after_submit] page head:\n", head)
+                page.wait_for_load_state("domcontentloaded")
             except Exception:
                 pass
 
+            dump("after_submit")
+
+            # Print a short page head to cloud logs so you can inspect remotely (debug capture only)
+            if self.debug.enabled and self.verbose:
+                try:
+                    head = page.content()[:2000]
+                    print("[DEBUG][after_submit] page head:\n", head)
+                except Exception:
+                    pass
+
             table_html = None
 
-            # Primary: wait for a table containing "Month" (longer timeout for cloud)
-            try:
-                sel = page.wait_for_selector("table:has-text('Month')", timeout=60_000)
-                if sel:
-                    table_html = sel.evaluate("el => el.outerHTML")
-            except PWTimeoutError:
-                pass
-            except Exception:
-                pass
+            # Primary: the monthly table (or BSE's "No Records Found.") showing up inside divStkData
+            result_selector = (
+                "#ContentPlaceHolder1_divStkData table:has(td:text-is('Month')), "
+                "#ContentPlaceHolder1_lblNoRecords"
+            )
+            with bse_metrics.span("table_wait", scraper="playwright"):
+                try:
+                    sel = page.wait_for_selector(result_selector, state="attached", timeout=30_000)
+                    if sel and sel.evaluate("el => el.tagName") == "TABLE":
+                        table_html = sel.evaluate("el => el.outerHTML")
+                    elif sel:
+                        raise RuntimeError(f"BSE returned no monthly records for scrip code {scrip_code} from {from_year}.")
+                except sync_api.TimeoutError:
+                    pass
 
             def find_table_html() -> str | None:
                 patterns = [re.compile(r"Month", re.I), re.compile(r"Close", re.I)]
@@ -464,30 +685,18 @@ class Scraper_bse:
                         continue
                 return None
             
-            table_html = None
-            for _ in range(8):  # ~ up to ~8 * 1s = 8 seconds
+            ## Fallback: the table may live in a frame; one scan, the waiting already happened above
+            if not table_html:
                 table_html = find_table_html()
-                print("In the final loop of table")
-                if table_html:
-                    break
-                page.wait_for_timeout(10000) ## this is 10 seconds  
 
             if not table_html:
-                dump("no_table_final", page.content())
-                try:
-                    full = page.content() ## saving so that I can see on logs
-                    print("[DEBUG] Saved final page content for debugging.")
-                except Exception as e:
-                    print("[ERROR] Failed to save final page content:", e)
-                browser.close()
-                raise RuntimeError("Monthly data table not found (even after submit & frame scan). See debug_stage_* files.")
+                dump("no_table_final")
+                raise RuntimeError("Monthly data table not found (even after submit & frame scan)." + self.debug.hint())
 
              # Build a minimal HTML fragment so _pick_monthly_data can parse
             fragment = f"<html><body>{table_html}</body></html>"
             if self.verbose:
                 print("[INFO] Monthly table captured; parsing...")
-            
-            browser.close()
 
             # print(f"this is the html: {html}")
 
@@ -501,7 +710,8 @@ class Scraper_bse:
             ## since we make the month and column in the df in the parse_monthly function
             ## here we just return the df
 
-            return self._pick_monthly_data(fragment)
+            with bse_metrics.span("table_extract", scraper="playwright"):
+                return self._pick_monthly_data(fragment)
     
     
     def _extract_qtrly_dates(self, df: pd.DataFrame) -> pd.DataFrame:
@@ -509,35 +719,15 @@ class Scraper_bse:
         if not {"Month", "Close"}.issubset(df.columns):
             raise ValueError("DataFrame must contain 'Month' and 'Close' columns")
 
-        rows: List[dict] = []
-        for _, r in df.iterrows():
-            m_raw = str(r["Month"]).strip()
-            # Expected like 'Mar 24' or 'Mar 2024'
-            parts = m_raw.split()
-            if len(parts) < 2:
-                continue
-            mon_abbr = parts[0].title()
-            if mon_abbr not in self.quarter_months:
-                continue
-            yy = int(parts[1])
-            year = 2000 + yy if yy < 100 else yy
-
-            # Close → float; BSE sometimes uses commas elsewhere, Close usually doesn't
-            try:
-                close = float(str(r["Close"]).replace(",", ""))
-            except Exception:
-                close = pd.NA
-
-            rows.append({"Quarter End": f"{mon_abbr.lower()} {year}", "Close": close})
-
-        out = pd.DataFrame(rows).dropna(subset=["Close"]).reset_index(drop=True)
-        # Sort by year/quarter
-        if not out.empty:
-            out["__key"] = out["Quarter End"].apply(
-                lambda s: (int(s.split()[1]), ["mar","jun","sep","dec"].index(s.split()[0]))
-            )
-            out = out.sort_values("__key", ascending=False).drop(columns="__key").reset_index(drop=True)
-        return out
+        with bse_metrics.span("quarterly_filter", scraper="playwright"):
+            # Expected like 'Mar 24' or 'Mar 2024'; Close may carry thousands separators
+            norm = normalize_monthly(df, month_col="Month", close_col="Close").dropna(subset=["Close"])
+            # Sort by year/quarter, latest first
+            out = quarter_ends(norm, ascending=False)
+            return pd.DataFrame({
+                "Quarter End": format_periods(out["Period"], "%b %Y").str.lower(),
+                "Close": out["Close"],
+            })
 
     
     def _get_qtrly_dates(self, scrip_code: int, from_year: int = 2024):
@@ -551,4 +741,5 @@ if __name__ == "__main__":
     s = Scraper_bse(headless=True, verbose=True)
     # TATA POWER = 500400, RELIANCE = 500325, TCS = 532540
     df = s._get_qtrly_dates(500400, from_year=2025)
-    print(df.head(12))
\ No newline at end of file
+    print(df.head(12))
+    s.close()
\ No newline at end of file
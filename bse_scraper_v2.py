@@ -1,15 +1,159 @@
+from __future__ import annotations
+
+import asyncio
 import datetime as dt
-import requests
-from bs4 import BeautifulSoup
-import pandas as pd
+import functools
+import html as htmllib
+import importlib.util
 # from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
-import os, sys
 from io import StringIO
 import re
+import threading
+import time
+import weakref
+from bse_store import monthly_store, month_index, month_from_index, index_to_label
+from bse_tokens import token_cache
+from bse_scrips import scrip_master
+from bse_frames import MONTH_LABEL, month_indices, month_ordinals
+from bse_throttle import host_limiter, retry_policy, retry_after, RETRY_STATUSES
+import bse_metrics
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
+from bse_lazy import lazy
+
+## imported on first use, a cold start only pays for what the first request needs
+httpx = lazy("httpx")
+bs4 = lazy("bs4")
+pd = lazy("pandas")
+np = lazy("numpy")
+etree = lazy("lxml.etree")
+
+## one semaphore and one limiter per (event loop, host), shared by every scraper instance in the process
+_HOST_SLOTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = weakref.WeakKeyDictionary()
+_HOST_LIMITERS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, host_limiter]]" = weakref.WeakKeyDictionary()
+
+## the sync API runs its coroutines on this loop so the connection pool survives between calls
+_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_LOOP_LOCK = threading.Lock()
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    global _LOOP
+    with _LOOP_LOCK:
+        if _LOOP is None:
+            _LOOP = asyncio.new_event_loop()
+            threading.Thread(target=_LOOP.run_forever, name="bse-scraper-loop", daemon=True).start()
+    return _LOOP
+
+
+def _run_sync(coro):
+    """ Run a coroutine on the shared background loop and block for its result"""
+    return asyncio.run_coroutine_threadsafe(coro, _background_loop()).result()
+
+
+async def _anext(agen):
+    return await agen.__anext__()
+
+
+def _iter_sync(agen):
+    """ Iterate an async generator from blocking code, one step at a time on the shared background loop"""
+    try:
+        while True:
+            try:
+                item = _run_sync(_anext(agen))
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        ## the caller stopped early (or we are done): cancels whatever the generator still runs
+        _run_sync(agen.aclose())
+
+
+@functools.lru_cache(maxsize=None)
+def _html_parser():
+    return etree.HTMLParser(remove_comments=True)
+
+@functools.lru_cache(maxsize=None)
+def _accept_encoding() -> str:
+    """ Content encodings httpx can decode here, best first; br and zstd need brotli / zstandard installed"""
+    encodings = []
+    if importlib.util.find_spec("brotli") or importlib.util.find_spec("brotlicffi"):
+        encodings.append("br")
+    if importlib.util.find_spec("zstandard"):
+        encodings.append("zstd")
+    return ", ".join(encodings + ["gzip", "deflate"])
+
+## every input the POST mirrors comes before the Submit button, a streamed token GET can stop there
+_FORM_TOKENS = (b'name="__VIEWSTATE"', b'name="__EVENTVALIDATION"', b'$hidCompanyVal"')
+_FORM_LAST = b'$btnSubmit"'
+
+
+def _until_form_read():
+    """ Stop condition for a streamed token GET: the length up to the end of the Submit button's tag, once it and the tokens were read"""
+    scanned, at = 0, -1
+    def done(body: bytearray) -> Optional[int]:
+        nonlocal scanned, at
+        if at < 0:
+            at = body.find(_FORM_LAST, max(0, scanned - len(_FORM_LAST)))
+            scanned = len(body)
+            if at < 0:
+                return None
+        end = body.find(b">", at)
+        ## a page without the tokens before its button is read to the end, _harvest_inputs reports it
+        if end < 0 or not all(token in body for token in _FORM_TOKENS):
+            return None
+        return end + 1
+    return done
+
+## the tags _fast_inputs reads; comments and script/style bodies are matched only to be skipped,
+## like a parser would. A tag's attributes may hold quoted '>'.
+_TAG_ATTRS = r"""(?:[^>"']|"[^"]*"|'[^']*')*"""
+_FORM_TAGS = re.compile(
+    r"<!--.*?-->|<(script|style)\b" + _TAG_ATTRS + r">.*?</\1\s*>"
+    r"|<(input|select|option|/select)\b(" + _TAG_ATTRS + r")>",
+    re.S | re.I,
+)
+_TAG_ATTR = re.compile(r"""([^\s"'>/=]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+)))?""")
+SETTLEMENT_SELECT = "ContentPlaceHolder1_ddlsetllementcal"
+
+
+def _tag_attrs(text: str) -> Dict[str, str]:
+    """ Attributes of one tag as the HTML parser sees them: names lower-cased, first one wins, entities decoded"""
+    attrs = {}
+    for m in _TAG_ATTR.finditer(text):
+        name = m.group(1).lower()
+        if name not in attrs:
+            value = next((v for v in m.group(2, 3, 4) if v is not None), "")
+            attrs[name] = htmllib.unescape(value) if "&" in value else value
+    return attrs
+
+## BSE's answer for a range with no trades, in place of the table
+_NO_RECORDS = re.compile(r'id="ContentPlaceHolder1_lblNoRecords"[^>]*>\s*[^<\s]')
+
+## the scrip a response is for, as the page's own hidden fields say
+_SCRIP_FIELDS = re.compile(r'\$(?:hdnCode|hiddenScripCode)"[^>]*?\bvalue="([^"]*)"')
+
+
+## how a fetch gets the months: "post" parses the table of the form POST, "download" posts the
+## Download button and parses the CSV, "auto" tries the table first and downloads when it is missing
+STRATEGIES = ("auto", "post", "download")
 
 class bse_scraper_2:
-    def __init__(self):
+    def __init__(self, max_per_host: int = 4, store: Optional[monthly_store] = None, tokens: Optional[token_cache] = None,
+                 rate_per_host: float = 5.0, retry: Optional[retry_policy] = None, scrips: Optional[scrip_master] = None):
+        self.max_per_host = max_per_host
+        self.rate_per_host = rate_per_host ## requests per second, before any Retry-After
+        self.retry = retry or retry_policy()
+        self.tokens = tokens or token_cache() ## harvested __VIEWSTATE & co, reused across POSTs
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+        self._inflight: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[tuple, asyncio.Task]]" = weakref.WeakKeyDictionary()
+        self.store = store ## optional on-disk cache of monthly closes
+        self.scrips = scrips ## optional scrip master: names are recorded, fetches start at the first month with data
+        self.months_per_post: Optional[int] = None ## None: one POST asks for the whole range
+        self.months_per_response: Dict[str, int] = {} ## learned per strategy from table POSTs: rows the server returns at most per response
+        self.parallel_windows = True
+        self.stream_tokens = False ## read the token GET only up to the form's last input (drops that keep-alive connection)
         self.base_url = "https://www.bseindia.com"
         self.path = (
             "/markets/equity/EQReports/StockPrcHistori.aspx"
@@ -22,8 +166,109 @@ class bse_scraper_2:
             )
         }
 
-    def _get_settlement_value(self, soup: BeautifulSoup) -> Optional[str]:
-        sel = soup.find("select", id="ContentPlaceHolder1_ddlsetllementcal")
+    def _host_slot(self) -> asyncio.Semaphore:
+        """ Returns the semaphore capping concurrent fetches to our host on the running loop"""
+        host = urlsplit(self.base_url).netloc
+        slots = _HOST_SLOTS.setdefault(asyncio.get_running_loop(), {})
+        if host not in slots:
+            slots[host] = asyncio.Semaphore(self.max_per_host)
+        return slots[host]
+
+    def _limiter(self) -> host_limiter:
+        """ Returns the rate / concurrency / breaker state of our host on the running loop"""
+        host = urlsplit(self.base_url).netloc
+        limiters = _HOST_LIMITERS.setdefault(asyncio.get_running_loop(), {})
+        if host not in limiters:
+            limiters[host] = host_limiter(max_concurrency=self.max_per_host, rate=self.rate_per_host)
+        return limiters[host]
+
+    async def _request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """ One HTTP request through the host limiter, retried with backoff on 429/502/503/504 and timeouts"""
+        return (await self._send(method, url, None, **kwargs))[0]
+
+    async def _send(self, method: str, url: str, until=None, **kwargs) -> tuple:
+        """ _request returning (response, body); with until a 2xx body is only read as far as until needs (see _read_until)"""
+        limiter = self._limiter()
+        client = self._client()
+        attempt = 0
+        while True:
+            r, body, error = None, None, None
+            if bse_metrics.enabled():
+                kwargs["extensions"] = {"trace": bse_metrics.httpx_trace()}
+            async with limiter.slot():
+                t0 = time.monotonic()
+                try:
+                    if until is None:
+                        r = await client.request(method, url, **kwargs)
+                        body = r.content
+                    else:
+                        r, body = await self._read_until(client, client.build_request(method, url, **kwargs), until)
+                except (httpx.TimeoutException, httpx.TransportError) as e:
+                    error = e
+                wait = retry_after(r) if r is not None and r.status_code in RETRY_STATUSES else None
+                limiter.record(None if r is None else r.status_code, time.monotonic() - t0, wait)
+
+            bse_metrics.count("bse_requests_total", method=method, status=r.status_code if r is not None else type(error).__name__)
+            if r is not None:
+                bse_metrics.count("bse_bytes_total", len(r.request.content), direction="sent")
+                bse_metrics.count("bse_bytes_total", r.num_bytes_downloaded, direction="received")
+
+            if r is not None and r.status_code not in RETRY_STATUSES:
+                return r, body
+            attempt += 1
+            if attempt >= self.retry.attempts:
+                if r is not None:
+                    return r, body
+                raise error
+            delay = self.retry.delay(attempt, wait)
+            bse_metrics.count("bse_retries_total", reason=r.status_code if r is not None else type(error).__name__)
+            print(f"[INFO] {method} {urlsplit(url).path} got {r.status_code if r is not None else repr(error)}, retry {attempt} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def _read_until(self, client: httpx.AsyncClient, request: httpx.Request, until) -> tuple:
+        """ (closed streamed response, decoded body up to the length until(body so far) returned); the response's own body is left unread"""
+        r = await client.send(request, stream=True)
+        try:
+            if not r.is_success:
+                return r, await r.aread()
+            body = bytearray()
+            async for chunk in r.aiter_bytes():
+                body += chunk
+                keep = until(body)
+                if keep is not None:
+                    ## the last chunk usually runs past the cut, what follows is not parsed either
+                    del body[keep:]
+                    break
+        finally:
+            ## stopping early closes the connection instead of returning it to the pool
+            await r.aclose()
+        return r, bytes(body)
+
+    def _client(self) -> httpx.AsyncClient:
+        """ Pooled keep-alive client for the running loop (connections cannot cross loops)"""
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(
+                ## compressed the pages are about a sixth of their size; br when brotli is installed
+                headers={**self.agent, "Accept-Encoding": _accept_encoding()},
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=self.max_per_host,
+                    max_keepalive_connections=self.max_per_host,
+                    keepalive_expiry=30,
+                ),
+            )
+            self._clients[loop] = client
+        return client
+
+    async def aclose(self) -> None:
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    def _get_settlement_value(self, soup: bs4.BeautifulSoup) -> Optional[str]:
+        sel = soup.find("select", id=SETTLEMENT_SELECT)
         if not sel:
             return None
         
@@ -33,7 +278,8 @@ class bse_scraper_2:
         return None
 
     def _find_monthly_table_html(self, html:str)->Optional[str]:
-        soup = BeautifulSoup(html, "lxml")
+        with bse_metrics.span("html_parse", scraper="httpx", path="soup"):
+            soup = bs4.BeautifulSoup(html, "lxml")
         given_root = soup.find(id="ContentPlaceHolder1_divStkData") or soup
         table = given_root.find("table")
 
@@ -44,6 +290,46 @@ class bse_scraper_2:
                 return str(tbl)
         return None
 
+    def _fast_monthly_table(self, html: str) -> Optional[pd.DataFrame]:
+        """ Fast path: Month/Close cells of the divStkData table, None when it is not there"""
+        anchor = html.find('id="ContentPlaceHolder1_divStkData"')
+        if anchor < 0:
+            return None
+        ## everything before the block (head, scripts, the search form) is never parsed
+        fragment = html[html.rfind("<", 0, anchor):]
+        with bse_metrics.span("html_parse", scraper="httpx", path="fast"):
+            root = etree.fromstring(fragment, _html_parser())
+        if root is None:
+            return None
+
+        for tbl in root.iterfind(".//table"):
+            rows = tbl.xpath("./tr|./tbody/tr|./thead/tr")
+            if not rows:
+                continue
+            ## column positions from the header row, honouring colspans
+            positions, col = {}, 0
+            for cell in rows[0]:
+                positions[" ".join("".join(cell.itertext()).split()).title()] = col
+                col += int(cell.get("colspan", 1) or 1)
+            if "Month" not in positions or "Close" not in positions:
+                continue
+
+            month_at, close_at = positions["Month"], positions["Close"]
+            months, closes = [], []
+            for row in rows[1:]:
+                cells = row.xpath("./td|./th")
+                if len(cells) <= max(month_at, close_at):
+                    continue
+                month = "".join(cells[month_at].itertext()).strip()
+                if not MONTH_LABEL.match(month):
+                    continue ## second header row, footnotes
+                months.append(month)
+                closes.append("".join(cells[close_at].itertext()).strip().replace(",", ""))
+
+            close_values = pd.to_numeric(np.asarray(closes, dtype=object), errors="coerce").astype("float64")
+            return pd.DataFrame({"Quarter End": np.asarray(months, dtype=object), "Close": close_values})
+        return None
+
     def _collect_inputs(self, soup):
         payload = {}
         for tag in soup.find_all(["input"]): # Not needed now "textarea", "select"
@@ -55,6 +341,34 @@ class bse_scraper_2:
             payload[name] = value
         return payload
     
+    def _fast_inputs(self, html: str) -> Optional[Dict[str, str]]:
+        """ Fast path of _harvest_inputs: one regex pass over the form tags, None when a .NET token is missing"""
+        inputs: Dict[str, str] = {}
+        settlement, in_settlement = None, False
+        for m in _FORM_TAGS.finditer(html):
+            tag = m.group(2)
+            if tag is None: ## a comment or a script
+                continue
+            tag = tag.lower()
+            if tag == "input":
+                attrs = _tag_attrs(m.group(3))
+                if "name" in attrs:
+                    inputs[attrs["name"]] = attrs.get("value", "")
+            elif tag == "select":
+                in_settlement = _tag_attrs(m.group(3)).get("id") == SETTLEMENT_SELECT
+            elif tag == "/select":
+                in_settlement = False
+            elif in_settlement and settlement is None:
+                attrs = _tag_attrs(m.group(3))
+                if "selected" in attrs:
+                    settlement = attrs.get("value")
+
+        if not all(inputs.get(k) for k in ("__VIEWSTATE", "__EVENTVALIDATION", "__VIEWSTATEGENERATOR")):
+            return None
+        if settlement is not None:
+            inputs["ctl00$ContentPlaceHolder1$ddlsetllementcal"] = settlement
+        return inputs
+
     def _decompose_monthly_table(self, table:str) -> pd.DataFrame:
         actual_table = self._find_monthly_table_html(table) or table
         tables = pd.read_html(StringIO(actual_table), header=0)
@@ -75,227 +389,546 @@ class bse_scraper_2:
         raise ValueError("Could not find the expected table with 'Month' and 'Close' columns.")
                 
 
-    def _get_monthly_table(self, script_code: int, from_month: int, from_year: int, to_month: Optional[int] = None, to_year: Optional[int] = None) -> pd.DataFrame:
-        BASE = self.base_url + self.path
-        BASE = BASE.format(code=script_code)
-        print("Fetching data from:", BASE)
+    def _harvest_inputs(self, html: str) -> Dict[str, str]:
+        """ All form inputs of a StockPrcHistori page (GET or POST response), with the settlement selection"""
+        inputs = self._fast_inputs(html)
+        if inputs is not None:
+            return inputs
 
+        ## markup the regex pass does not follow: the full parse, which also names a missing token
+        soup = bs4.BeautifulSoup(html, "lxml")
+
+        # baseline payload (all inputs present)
+        inputs = self._collect_inputs(soup)
+
+        ## some checks for the .NET tokens
+        for k in ("__VIEWSTATE", "__EVENTVALIDATION", "__VIEWSTATEGENERATOR"):
+            if not inputs.get(k): raise RuntimeError(f"Missing token: {k}")
+        
+        # Keep current settlement selection
+        settlement_value = self._get_settlement_value(soup)
+        if settlement_value is not None:
+            inputs["ctl00$ContentPlaceHolder1$ddlsetllementcal"] = settlement_value
+        return inputs
+
+    def _build_payload(self, inputs: Dict[str, str], script_code: int, from_month: int, from_year: int, to_month: Optional[int] = None, to_year: Optional[int] = None) -> Dict[str, str]:
+        """ Turn the harvested inputs into the monthly-view POST payload for the given scrip and month range"""
         mm = f"{from_month:02d}"
         yyyy = str(from_year)
+        to_date = dt.date.today()
+        if to_month and to_year:
+            ## last day of the to-month, never past today
+            next_first = dt.date(to_year + to_month // 12, to_month % 12 + 1, 1)
+            to_date = min(to_date, next_first - dt.timedelta(days=1))
+        # override essentials
+        payload = dict(inputs)
+
+        ## Now we add more required tokens to form the complete payload
+        payload.update({
+            ## Indicating the code by the user
+            "ctl00$ContentPlaceHolder1$hdnCode": str(script_code),
+            "ctl00$ContentPlaceHolder1$hiddenScripCode": str(script_code),
+
+            ## indicating the monthly data
+            "ctl00$ContentPlaceHolder1$DMY": "rdbMonthly",
+            "ctl00$ContentPlaceHolder1$hidDMY": "M",
+            "ctl00$ContentPlaceHolder1$cmbMonthly": mm,
+            "ctl00$ContentPlaceHolder1$cmbMYear": yyyy,
+
+            # optional mirrors; harmless and often present
+            "ctl00$ContentPlaceHolder1$hidFromDate": f"01/{mm}/{yyyy}",
+            "ctl00$ContentPlaceHolder1$hidToDate": to_date.strftime("%d/%m/%Y"),
+
+            # "ctl00$ContentPlaceHolder1$btnSubmit": "Submit",
+            # Proper WebForms postback
+            # "__EVENTTARGET": "ctl00$ContentPlaceHolder1$btnSubmit",
+            "__EVENTTARGET": "", ## as per my check, this is empty string
+            "__EVENTARGUMENT": "",
+
+        })
+
+        ## checking all the required fields are present
+        required_fields = [
+            "__EVENTTARGET", "__EVENTARGUMENT",
+            "__VIEWSTATE", "__VIEWSTATEGENERATOR", "__EVENTVALIDATION", "__VIEWSTATEENCRYPTED",
+        "ctl00$ContentPlaceHolder1$hdnCode",
+        "ctl00$ContentPlaceHolder1$DDate",
+        "ctl00$ContentPlaceHolder1$hidDMY",
+        "ctl00$ContentPlaceHolder1$hdflag",
+        "ctl00$ContentPlaceHolder1$hidCurrentDate",
+        "ctl00$ContentPlaceHolder1$hidYear",
+        "ctl00$ContentPlaceHolder1$hidFromDate",
+        "ctl00$ContentPlaceHolder1$hidToDate",
+        "ctl00$ContentPlaceHolder1$hidOldDMY",
+        "ctl00$ContentPlaceHolder1$hiddenScripCode",
+        "ctl00$ContentPlaceHolder1$hidCompanyVal",
+        "ctl00$ContentPlaceHolder1$ddlsetllementcal",
+        "ctl00$ContentPlaceHolder1$Hidden1",
+        "ctl00$ContentPlaceHolder1$smartSearch",
+        "ctl00$ContentPlaceHolder1$scripname",
+        "ctl00$ContentPlaceHolder1$Hidden4",
+        "ctl00$ContentPlaceHolder1$smartSearch_TO",
+        "ctl00$ContentPlaceHolder1$scriptnameTO",
+        "ctl00$ContentPlaceHolder1$Hidden2",
+        "ctl00$ContentPlaceHolder1$smartSearch_mf",
+        "ctl00$ContentPlaceHolder1$scriptnamemf",
+        "ctl00$ContentPlaceHolder1$Hidden3",
+        "ctl00$ContentPlaceHolder1$smartSearch_Debt",
+        "ctl00$ContentPlaceHolder1$ScriptnameDebt",
+        "ctl00$ContentPlaceHolder1$DMY",
+        "ctl00$ContentPlaceHolder1$cmbMonthly",
+        "ctl00$ContentPlaceHolder1$cmbMYear",
+        "ctl00$ContentPlaceHolder1$btnSubmit"
+        ]
+        # not_present = [element for element in required_fields if element not in payload]
+        # present_vals = [print(f"{element}={payload[element]}") for element in required_fields if element in payload]
+
+        """ Debugging info"""
+
+        # [DEBUG 1]
+        # for element in required_fields:
+        #     if element in payload:
+        #         print(f'{element}={payload[element]}')
+
+        # [DEBUG 2]
+        # print("Payload check, missing fields:", not_present)
+        # print("payload elements: ", present_vals)
+        """
+        So, after checking all the fields, we do not need any value in Hidden1 so I am going to leave that.
+        apart from that, I am going to populate all the fields that are missing with the name of the hidCompanyVal
+        like RELIANCE or TATAPOWER or whatever the scrip code is.
+
+        ** Also check hidToDate was empty in Network->Payload: If any errors then fallback to an empty date as it is in the original form.
+        """
+
+        payload["ctl00$ContentPlaceHolder1$smartSearch"] = payload.get("ctl00$ContentPlaceHolder1$hidCompanyVal", "")
+        payload["ctl00$ContentPlaceHolder1$Hidden4"] = payload.get("ctl00$ContentPlaceHolder1$hidCompanyVal", "")
+        payload["ctl00$ContentPlaceHolder1$smartSearch_TO"] = payload.get("ctl00$ContentPlaceHolder1$hidCompanyVal", "")
+        payload["ctl00$ContentPlaceHolder1$Hidden2"] = payload.get("ctl00$ContentPlaceHolder1$hidCompanyVal", "")
+        payload["ctl00$ContentPlaceHolder1$smartSearch_mf"] = payload.get("ctl00$ContentPlaceHolder1$hidCompanyVal", "")
+        payload["ctl00$ContentPlaceHolder1$Hidden3"] = payload.get("ctl00$ContentPlaceHolder1$hidCompanyVal", "")
+        payload["ctl00$ContentPlaceHolder1$smartSearch_Debt"] = payload.get("ctl00$ContentPlaceHolder1$hidCompanyVal", "")
 
-        with requests.Session() as s:
+        return payload
 
-            ## first we get the html file to retrieve all the inputs that we will later use to post the form
-            r = s.get(BASE, headers=self.agent, timeout=20)
-            r.raise_for_status()
-            soup = BeautifulSoup(r.text, "lxml")
-
-            # baseline payload (all inputs present) + override essentials
-            payload = self._collect_inputs(soup)
-
-            ## some checks for the .NET tokens
-            for k in ("__VIEWSTATE", "__EVENTVALIDATION", "__VIEWSTATEGENERATOR"):
-                if not payload.get(k): raise RuntimeError(f"Missing token: {k}")
-            
-            # Keep current settlement selection
-            settlement_value = self._get_settlement_value(soup)
-            if settlement_value is not None:
-                payload["ctl00$ContentPlaceHolder1$ddlsetllementcal"] = settlement_value
-
-
-            ## Now we add more required tokens to form the complete payload
-            payload.update({
-                ## Indicating the code by the user
-                "ctl00$ContentPlaceHolder1$hdnCode": str(script_code),
-                "ctl00$ContentPlaceHolder1$hiddenScripCode": str(script_code),
-
-                ## indicating the monthly data
-                "ctl00$ContentPlaceHolder1$DMY": "rdbMonthly",
-                "ctl00$ContentPlaceHolder1$hidDMY": "M",
-                "ctl00$ContentPlaceHolder1$cmbMonthly": mm,
-                "ctl00$ContentPlaceHolder1$cmbMYear": yyyy,
-
-                # optional mirrors; harmless and often present
-                "ctl00$ContentPlaceHolder1$hidFromDate": f"01/{mm}/{yyyy}",
-                "ctl00$ContentPlaceHolder1$hidToDate": dt.date.today().strftime("%d/%m/%Y"),
-
-                # "ctl00$ContentPlaceHolder1$btnSubmit": "Submit",
-                # Proper WebForms postback
-                # "__EVENTTARGET": "ctl00$ContentPlaceHolder1$btnSubmit",
-                "__EVENTTARGET": "", ## as per my check, this is empty string
-                "__EVENTARGUMENT": "",
-
-            })
-
-            ## checking all the required fields are present
-            required_fields = [
-                "__EVENTTARGET", "__EVENTARGUMENT",
-                "__VIEWSTATE", "__VIEWSTATEGENERATOR", "__EVENTVALIDATION", "__VIEWSTATEENCRYPTED",
-            "ctl00$ContentPlaceHolder1$hdnCode",
-            "ctl00$ContentPlaceHolder1$DDate",
-            "ctl00$ContentPlaceHolder1$hidDMY",
-            "ctl00$ContentPlaceHolder1$hdflag",
-            "ctl00$ContentPlaceHolder1$hidCurrentDate",
-            "ctl00$ContentPlaceHolder1$hidYear",
-            "ctl00$ContentPlaceHolder1$hidFromDate",
-            "ctl00$ContentPlaceHolder1$hidToDate",
-            "ctl00$ContentPlaceHolder1$hidOldDMY",
-            "ctl00$ContentPlaceHolder1$hiddenScripCode",
-            "ctl00$ContentPlaceHolder1$hidCompanyVal",
-            "ctl00$ContentPlaceHolder1$ddlsetllementcal",
-            "ctl00$ContentPlaceHolder1$Hidden1",
-            "ctl00$ContentPlaceHolder1$smartSearch",
-            "ctl00$ContentPlaceHolder1$scripname",
-            "ctl00$ContentPlaceHolder1$Hidden4",
-            "ctl00$ContentPlaceHolder1$smartSearch_TO",
-            "ctl00$ContentPlaceHolder1$scriptnameTO",
-            "ctl00$ContentPlaceHolder1$Hidden2",
-            "ctl00$ContentPlaceHolder1$smartSearch_mf",
-            "ctl00$ContentPlaceHolder1$scriptnamemf",
-            "ctl00$ContentPlaceHolder1$Hidden3",
-            "ctl00$ContentPlaceHolder1$smartSearch_Debt",
-            "ctl00$ContentPlaceHolder1$ScriptnameDebt",
-            "ctl00$ContentPlaceHolder1$DMY",
-            "ctl00$ContentPlaceHolder1$cmbMonthly",
-            "ctl00$ContentPlaceHolder1$cmbMYear",
-            "ctl00$ContentPlaceHolder1$btnSubmit"
-            ]
-            # not_present = [element for element in required_fields if element not in payload]
-            # present_vals = [print(f"{element}={payload[element]}") for element in required_fields if element in payload]
-
-            """ Debugging info"""
-
-            # [DEBUG 1]
-            # for element in required_fields:
-            #     if element in payload:
-            #         print(f'{element}={payload[element]}')
-
-            # [DEBUG 2]
-            # print("Payload check, missing fields:", not_present)
-            # print("payload elements: ", present_vals)
-            """
-            So, after checking all the fields, we do not need any value in Hidden1 so I am going to leave that.
-            apart from that, I am going to populate all the fields that are missing with the name of the hidCompanyVal
-            like RELIANCE or TATAPOWER or whatever the scrip code is.
-
-            ** Also check hidToDate was empty in Network->Payload: If any errors then fallback to an empty date as it is in the original form.
-            """
-
-            payload["ctl00$ContentPlaceHolder1$smartSearch"] = payload.get("ctl00$ContentPlaceHolder1$hidCompanyVal", "")
-            payload["ctl00$ContentPlaceHolder1$Hidden4"] = payload.get("ctl00$ContentPlaceHolder1$hidCompanyVal", "")
-            payload["ctl00$ContentPlaceHolder1$smartSearch_TO"] = payload.get("ctl00$ContentPlaceHolder1$hidCompanyVal", "")
-            payload["ctl00$ContentPlaceHolder1$Hidden2"] = payload.get("ctl00$ContentPlaceHolder1$hidCompanyVal", "")
-            payload["ctl00$ContentPlaceHolder1$smartSearch_mf"] = payload.get("ctl00$ContentPlaceHolder1$hidCompanyVal", "")
-            payload["ctl00$ContentPlaceHolder1$Hidden3"] = payload.get("ctl00$ContentPlaceHolder1$hidCompanyVal", "")
-            payload["ctl00$ContentPlaceHolder1$smartSearch_Debt"] = payload.get("ctl00$ContentPlaceHolder1$hidCompanyVal", "")
-
-
-
-            ## post the form
-            r1 = s.post(
-                BASE,
-                headers = {"Referer": BASE, **self.agent},
-                data = payload,
-                timeout=20
-            )
+    def _parse_monthly_response(self, html: str) -> pd.DataFrame:
+        """ Monthly table of the POST response, with Close as numbers"""
+        with bse_metrics.span("table_extract", scraper="httpx", path="fast"):
+            df = self._fast_monthly_table(html)
+        if df is not None and not df.empty:
+            return df
+        if _NO_RECORDS.search(html):
+            ## a valid answer: nothing traded in the range
+            return pd.DataFrame({"Quarter End": pd.Series(dtype=object), "Close": pd.Series(dtype="float64")})
+        with bse_metrics.span("table_extract", scraper="httpx", path="soup"):
+            df = self._decompose_monthly_table(html)
+        df["Close"] = pd.to_numeric(
+            df["Close"].astype(str).str.replace(",", ""), errors="coerce"
+        )
+        return df
 
-            r1.raise_for_status()
+    def _parse_download(self, text: str) -> pd.DataFrame:
+        """ Month/Close columns of the CSV returned by the Download postback"""
+        df = pd.read_csv(StringIO(text))
+        month_col = next((c for c in df.columns if re.search(r"\bmonth\b", str(c), re.I)), None)
+        close_col = next((c for c in df.columns if re.search(r"\bclose\b", str(c), re.I)), None)
+        if not (month_col and close_col):
+            raise ValueError("Download did not return recognizable Month/Close columns.")
+        df = df[[month_col, close_col]].copy()
+        df.columns = ["Quarter End", "Close"]
+
+        df["Close"] = pd.to_numeric(df["Close"].astype(str).str.replace(",", ""), errors="coerce")
+        return df
 
-            ## we will now parse the resulting html to extract the table
-            try:
-                df = self._decompose_monthly_table(r1.text)
-                df["Close"] = pd.to_numeric(
-                    df["Close"].astype(str).str.replace(",", ""), errors="coerce"
-                )
+    async def _harvest_tokens(self, url: str, script_code: int) -> Dict[str, str]:
+        """ GET the page, harvest its inputs and remember them in the token cache"""
+        with bse_metrics.span("token_get", scraper="httpx"):
+            r, body = await self._send("GET", url, _until_form_read() if self.stream_tokens else None, timeout=20)
+        r.raise_for_status()
+        ## parsing is CPU bound, keep it off the event loop
+        with bse_metrics.span("token_parse", scraper="httpx"):
+            inputs = await asyncio.to_thread(self._harvest_inputs, body.decode(r.encoding or "utf-8", errors="replace"))
+        self.tokens.put(script_code, inputs)
+        if self.scrips is not None:
+            self.scrips.seen(script_code, inputs.get("ctl00$ContentPlaceHolder1$hidCompanyVal"))
+        return inputs
+
+    async def _aget_monthly_table(self, script_code: int, from_month: int, from_year: int, to_month: Optional[int] = None, to_year: Optional[int] = None, strategy: str = "auto") -> pd.DataFrame:
+        """ Single-flight front of _afetch_monthly_table: same (scrip, months, strategy) on the loop share one fetch"""
+        key = (str(script_code), from_month, from_year, to_month, to_year, strategy)
+        loop = asyncio.get_running_loop()
+        inflight = self._inflight.setdefault(loop, {})
+        task = inflight.get(key)
+        bse_metrics.count("bse_cache_total", cache="inflight", result="miss" if task is None else "hit")
+        if task is None:
+            task = loop.create_task(self._afetch_monthly_table(script_code, from_month, from_year, to_month, to_year, strategy))
+            inflight[key] = task
+            task.add_done_callback(lambda _t: inflight.pop(key, None))
+        else:
+            print(f"[INFO] Joining in-flight fetch for {script_code} {from_month:02d}/{from_year}")
+        ## shield: one caller giving up must not cancel the fetch the others wait on
+        df = await asyncio.shield(task)
+        return df.copy()
+
+    async def _afetch_monthly_table(self, script_code: int, from_month: int, from_year: int, to_month: Optional[int] = None, to_year: Optional[int] = None, strategy: str = "auto") -> pd.DataFrame:
+        """ Async GET tokens -> POST form -> parse, over the pooled keep-alive client (see STRATEGIES)"""
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy {strategy!r}, expected one of {STRATEGIES}")
+        BASE = self.base_url + self.path
+        BASE = BASE.format(code=script_code)
+        print("Fetching data from:", BASE)
 
-                return df
-            
-            except Exception:
-                # Fallback: use the Download postback (often returns CSV)
-                dl_payload = payload.copy()
-                dl_payload["__EVENTTARGET"] = "ctl00$ContentPlaceHolder1$btnDownload"
-                r2 = s.post(
-                    BASE,
-                    headers={"Referer": BASE, **self.agent},
-                    data=dl_payload,
-                    timeout=45
-                )
-                r2.raise_for_status()
-                df = pd.read_csv(StringIO(r2.text))
-                month_col = next((c for c in df.columns if re.search(r"\bmonth\b", str(c), re.I)), None)
-                close_col = next((c for c in df.columns if re.search(r"\bclose\b", str(c), re.I)), None)
-                if not (month_col and close_col):
-                    raise ValueError("Download did not return recognizable Month/Close columns.")
-                df = df[[month_col, close_col]].copy()
-                df.columns = ["Quarter End", "Close"]
-
-            df["Close"] = pd.to_numeric(df["Close"].astype(str).str.replace(",", ""), errors="coerce")
+        async with self._host_slot():
+
+            ## first we get the html file to retrieve all the inputs that we will later use to post the form
+            ## a CSV download cannot be checked for the scrip it is about, it only takes the scrip's own tokens
+            inputs = self.tokens.get(script_code, shared=strategy != "download")
+            reused = inputs is not None
+            bse_metrics.count("bse_cache_total", cache="tokens", result="hit" if reused else "miss")
+            if not reused:
+                inputs = await self._harvest_tokens(BASE, script_code)
+            payload = self._build_payload(inputs, script_code, from_month, from_year, to_month, to_year)
+
+            if strategy != "download":
+                ## post the form
+                with bse_metrics.span("form_post", scraper="httpx"):
+                    r1 = await self._request(
+                        "POST",
+                        BASE,
+                        headers = {"Referer": BASE},
+                        data = payload,
+                        timeout=20
+                    )
+
+                df = await self._try_parse(r1, script_code)
+                if df is None and reused:
+                    print(f"[INFO] Cached tokens rejected for {script_code}, harvesting fresh ones")
+                    self.tokens.invalidate(script_code)
+                    reused = False
+                    inputs = await self._harvest_tokens(BASE, script_code)
+                    payload = self._build_payload(inputs, script_code, from_month, from_year, to_month, to_year)
+                    with bse_metrics.span("form_post", scraper="httpx"):
+                        r1 = await self._request(
+                            "POST",
+                            BASE,
+                            headers = {"Referer": BASE},
+                            data = payload,
+                            timeout=20
+                        )
+                    df = await self._try_parse(r1, script_code)
+
+                r1.raise_for_status()
+
+                ## we will now parse the resulting html to extract the table
+                if df is not None:
+                    ## the response carries a fresh set of tokens for this scrip, keep them
+                    try:
+                        self.tokens.put(script_code, await asyncio.to_thread(self._harvest_inputs, r1.text))
+                    except Exception:
+                        pass
+                    df.attrs["source"] = "post"
+                    return df
+
+                if strategy == "post":
+                    raise ValueError(f"No monthly table in the response for scrip code {script_code}")
+
+            # Fallback: use the Download postback (often returns CSV)
+            r2 = await self._post_download(BASE, payload)
+            if r2.is_error and reused:
+                ## with "download" no table POST has vouched for the cached tokens yet
+                print(f"[INFO] Cached tokens rejected for {script_code}, harvesting fresh ones")
+                self.tokens.invalidate(script_code)
+                inputs = await self._harvest_tokens(BASE, script_code)
+                payload = self._build_payload(inputs, script_code, from_month, from_year, to_month, to_year)
+                r2 = await self._post_download(BASE, payload)
+            r2.raise_for_status()
+            df = await asyncio.to_thread(self._parse_download, r2.text)
+            df.attrs["source"] = "download"
             return df
+
+    async def _post_download(self, url: str, payload: Dict[str, str]) -> httpx.Response:
+        """ The Download button's postback for the same form"""
+        dl_payload = payload.copy()
+        dl_payload["__EVENTTARGET"] = "ctl00$ContentPlaceHolder1$btnDownload"
+        with bse_metrics.span("download_post", scraper="httpx"):
+            return await self._request(
+                "POST",
+                url,
+                headers={"Referer": url},
+                data=dl_payload,
+                timeout=45
+            )
+
+    async def _try_parse(self, r: httpx.Response, script_code) -> Optional[pd.DataFrame]:
+        """ Parsed monthly table of a POST response, None when there is none or it is for another scrip"""
+        if r.is_error:
+            return None
+        codes = set(_SCRIP_FIELDS.findall(r.text))
+        if codes != {str(script_code)}:
+            if codes:
+                print(f"[WARN] Response for scrip code {script_code} is for {', '.join(sorted(codes))}")
+            return None
+        try:
+            return await asyncio.to_thread(self._parse_monthly_response, r.text)
+        except Exception:
+            return None
+
+    def _get_monthly_table(self, script_code: int, from_month: int, from_year: int, to_month: Optional[int] = None, to_year: Optional[int] = None, strategy: str = "auto") -> pd.DataFrame:
+        """ Blocking wrapper around _aget_monthly_table"""
+        return _run_sync(self._aget_monthly_table(script_code, from_month, from_year, to_month, to_year, strategy))
         
     ## Now we have to just get the quarters from the list
     def _get_quarterly_dates(self, df: pd.DataFrame)->pd.DataFrame:
         df_qtr = df.copy()
-        quarterly_months = ["Mar", "Jun", "Sep", "Dec"]
         # print("DEBUG: data types of date column: \n", df_qtr.dtypes)
 
         # print("[DEBUG]: original df", df)
-        df_qtr = df_qtr[df_qtr["Quarter End"].astype(str).str.slice(0,3).isin(quarterly_months)]
+        ## vectorized: month ordinals of the labels, Mar/Jun/Sep/Dec are ordinal % 12 in (2, 5, 8, 11)
+        with bse_metrics.span("quarterly_filter", scraper="httpx"):
+            ordinals = month_ordinals(df_qtr["Quarter End"])
+            df_qtr = df_qtr[(ordinals >= 0) & (ordinals % 12 % 3 == 2)]
         return df_qtr
     
-    def _calculate_next_month_year(self, df:pd.DataFrame)->tuple:
-        """ This function will calculate the next month and year from the last entry in the dataframe"""
-        df_last = df.iloc[-1]["Quarter End"]
-        last_year = int("20"+ df_last.split()[-1])
-        last_month_str = df_last.split()[0]
-
-        print(f"[DEBUG] Last entry in the dataframe is for {last_month_str} {last_year}")
-        
-        monthly_mapping = {
-            "Jan": 1, "Feb": 2, "Mar": 3, "Apr": 4,
-            "May": 5, "Jun": 6, "Jul": 7, "Aug": 8,
-            "Sep": 9, "Oct": 10, "Nov": 11, "Dec": 12
-        }
-        last_month_int = monthly_mapping.get(last_month_str, None)
-        if last_month_int is None:
-            raise ValueError(f"Could not parse month from string: {last_month_str}")
-
-        if last_month_int < 12:
-            next_month_int = last_month_int + 1
-            next_year = last_year
-        else:
-            next_month_int = 1
-            next_year = last_year + 1
-
-        return next_month_int, next_year
-    
-    def _recurse_until_today(self, script_code:int, from_month:int, from_year:int)->pd.DataFrame:
-        """ This function will keep calling _get_monthly_table until we reach current month and year"""
-        current_date = dt.date.today()
-        current_month = current_date.month
-        current_year = current_date.year
-
-        ## first itertion
-        df = self._get_monthly_table(script_code, from_month, from_year)
+    def _recurse_until_today(self, script_code:int, from_month:int, from_year:int, strategy: str = "auto")->pd.DataFrame:
+        """ Monthly closes from from_month/from_year up to today, served from the store when one is attached"""
+        return self._through_store(script_code, from_month, from_year, functools.partial(self._fetch_until_today, strategy=strategy))
+
+    def _iter_recurse_until_today(self, script_code:int, from_month:int, from_year:int, strategy: str = "auto"):
+        """ _recurse_until_today as a generator of frames: the stored months first, then one frame per POST"""
+        return self._iter_through_store(script_code, from_month, from_year, functools.partial(self._iter_until_today, strategy=strategy))
+
+    def _store_fetch_from(self, script_code, start: int) -> Optional[int]:
+        """ First month index that has to come from BSE for a request starting at start, None if the store has it all"""
+        today = dt.date.today()
+        current = month_index(today.month, today.year)
+
+        fetch_from = start
+        if self.store.covers(script_code, start):
+            newest = self.store.newest_final(script_code)
+            if newest is not None:
+                fetch_from = max(start, newest + 1)
+
+        ## partial: closed months from the store, only the newer ones fetched
+        result = "hit" if fetch_from > current else "miss" if fetch_from == start else "partial"
+        bse_metrics.count("bse_cache_total", cache="store", result=result)
+        if fetch_from > current:
+            return None
+        print(f"[INFO] Store miss for {script_code} from {index_to_label(fetch_from)}")
+        return fetch_from
+
+    def _through_store(self, script_code, from_month: int, from_year: int, fetch) -> pd.DataFrame:
+        """ The store logic of _recurse_until_today around any fetch(script_code, from_month, from_year)"""
+        if self.store is None:
+            return fetch(script_code, from_month, from_year)
+
+        start = month_index(from_month, from_year)
+        fetch_from = self._store_fetch_from(script_code, start)
+        if fetch_from is not None:
+            df_new = fetch(script_code, *month_from_index(fetch_from))
+            self.store.save(script_code, df_new, fetch_from)
+
+        return self.store.load(script_code, start)
+
+    def _iter_through_store(self, script_code, from_month: int, from_year: int, iterate):
+        """ _through_store for iterate(script_code, from_month, from_year) yielding frames"""
+        if self.store is None:
+            yield from iterate(script_code, from_month, from_year)
+            return
+
+        start = month_index(from_month, from_year)
+        fetch_from = self._store_fetch_from(script_code, start)
+        if fetch_from is None:
+            yield self.store.load(script_code, start)
+            return
+        if fetch_from > start:
+            stored = self.store.load(script_code, start, fetch_from - 1)
+            if not stored.empty:
+                yield stored
+
+        chunks = []
+        for chunk in iterate(script_code, *month_from_index(fetch_from)):
+            chunks.append(chunk)
+            yield chunk
+        df_new = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame({"Quarter End": [], "Close": []})
+        self.store.save(script_code, df_new, fetch_from)
+
+    def _plan_month_ranges(self, start: int, end: int, step: Optional[int] = None, strategy: str = "auto") -> List[tuple]:
+        """ Split the month indices [start, end] into the fewest POST windows of at most step months"""
+        if start > end:
+            return []
+        step = step or self.months_per_post or self.months_per_response.get(strategy)
+        if not step:
+            return [(start, end)]
+        return [(lo, min(lo + step - 1, end)) for lo in range(start, end + 1, step)]
+
+    def _with_periods(self, df: pd.DataFrame) -> pd.DataFrame:
+        """ Adds a month index column parsed from 'Quarter End', dropping rows that are not months"""
+        periods = month_indices(df["Quarter End"])
+        df = df.loc[periods >= 0].copy()
+        df["__period"] = periods[periods >= 0]
+        return df
 
-        next_month, next_year = self._calculate_next_month_year(df)
-        while (next_year <= current_year) and (next_month <= current_month):
-            print(f"[INFO] Fetching data for {next_month:02d}/{next_year}")
-            df_next = self._get_monthly_table(script_code, next_month, next_year)
-            df = pd.concat([df, df_next], ignore_index=True)
+    async def _apost_window(self, script_code: int, lo: int, hi: int, strategy: str = "auto") -> pd.DataFrame:
+        """ One POST for the months [lo, hi]: its rows within the window, with '__period' (attrs["source"] says table or CSV)"""
+        from_month, from_year = month_from_index(lo)
+        to_month, to_year = month_from_index(hi)
+        raw = await self._aget_monthly_table(script_code, from_month, from_year, to_month, to_year, strategy)
+        df = self._with_periods(raw)
+        df = df[(df["__period"] >= lo) & (df["__period"] <= hi)]
+        df.attrs["source"] = raw.attrs.get("source")
+        return df
 
-            next_month, next_year = self._calculate_next_month_year(df)
+    async def _aiter_window(self, script_code: int, lo: int, hi: int, strategy: str = "auto"):
+        """ Cover the months [lo, hi], yielding each POST's rows"""
+        df = await self._apost_window(script_code, lo, hi, strategy)
+        if df.empty:
+            ## nothing traded in this window
+            return
+        yield df
+        today = dt.date.today()
+        last, got = int(df["__period"].max()), len(df)
+        cap = self.months_per_response.get(strategy)
+        if last >= min(hi, month_index(today.month, today.year)) or (cap is not None and got < cap):
+            return
+
+        ## short of hi: the server caps the rows per response, the first time one more POST confirms the history goes on
+        if cap is None:
+            ## a CSV download is not capped like the table, it cannot tell us the table's cap
+            if df.attrs.get("source") != "post":
+                return
+            probe = await self._apost_window(script_code, last + 1, min(last + got, hi), strategy)
+            if probe.empty:
+                return
+            self.months_per_response[strategy] = cap = got
+            print(f"[INFO] Server returns at most {got} months per response, sizing windows to match")
+            yield probe
+            last = int(probe["__period"].max())
+            if last >= hi or len(probe) < cap:
+                return
+
+        async for df in self._aiter_windows(script_code, self._plan_month_ranges(last + 1, hi, cap), strategy):
+            yield df
+
+    async def _aiter_windows(self, script_code: int, windows: List[tuple], strategy: str = "auto"):
+        """ The rows of every window as each POST completes, with their '__period'"""
+        if not self.parallel_windows or len(windows) < 2:
+            for lo, hi in windows:
+                async for df in self._aiter_window(script_code, lo, hi, strategy):
+                    yield df
+            return
+
+        ## every window pumps into one queue; None marks a finished window
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def pump(lo, hi):
+            try:
+                async for df in self._aiter_window(script_code, lo, hi, strategy):
+                    queue.put_nowait(df)
+            except Exception as e:
+                queue.put_nowait(e)
+            finally:
+                queue.put_nowait(None)
+
+        loop = asyncio.get_running_loop()
+        tasks = [loop.create_task(pump(lo, hi)) for lo, hi in windows]
+        try:
+            running = len(tasks)
+            while running:
+                item = await queue.get()
+                if item is None:
+                    running -= 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    yield item
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _aiter_chunks(self, script_code:int, from_month:int, from_year:int, strategy: str = "auto"):
+        """ The rows of every planned window up to the current month as each POST completes, with their '__period'"""
+        today = dt.date.today()
+        start = month_index(from_month, from_year)
+        if self.scrips is not None:
+            start = self.scrips.start_for(script_code, start)
+        windows = self._plan_month_ranges(start, month_index(today.month, today.year), strategy=strategy)
+        first = None
+        async for df in self._aiter_windows(script_code, windows, strategy):
+            first = int(df["__period"].min()) if first is None else min(first, int(df["__period"].min()))
+            yield df
+        ## every window is done: nothing exists between start and the first row
+        if self.scrips is not None and first is not None and first > start:
+            self.scrips.saw_first(script_code, first, start)
+
+    async def _aiter_until_today(self, script_code:int, from_month:int, from_year:int, strategy: str = "auto"):
+        """ Monthly closes from from_month/from_year up to the current month, one ['Quarter End', 'Close'] frame per POST"""
+        async for df in self._aiter_chunks(script_code, from_month, from_year, strategy):
+            yield df.sort_values("__period").drop(columns="__period").reset_index(drop=True)
+
+    async def _afetch_until_today(self, script_code:int, from_month:int, from_year:int, strategy: str = "auto")->pd.DataFrame:
+        """ Monthly closes from from_month/from_year up to the current month, using the fewest POSTs we can plan"""
+        frames = [df async for df in self._aiter_chunks(script_code, from_month, from_year, strategy)]
+        if not frames:
+            return pd.DataFrame({"Quarter End": pd.Series(dtype="object"), "Close": pd.Series(dtype="float64")})
+
+        ## one concat at the end instead of growing the frame per POST
+        df = pd.concat(frames, ignore_index=True)
+        df = df.drop_duplicates(subset="__period", keep="last").sort_values("__period")
+        return df.drop(columns="__period").reset_index(drop=True)
+
+    def _fetch_until_today(self, script_code:int, from_month:int, from_year:int, strategy: str = "auto")->pd.DataFrame:
+        """ Blocking wrapper around _afetch_until_today"""
+        return _run_sync(self._afetch_until_today(script_code, from_month, from_year, strategy))
+
+    def _iter_until_today(self, script_code:int, from_month:int, from_year:int, strategy: str = "auto"):
+        """ Blocking generator over _aiter_until_today"""
+        return _iter_sync(self._aiter_until_today(script_code, from_month, from_year, strategy))
+
+    def _fetch_many(self, script_codes: List[int], from_month: int, from_year: int, max_workers: int = 8, quarterly: bool = False) -> pd.DataFrame:
+        """ Fetch several scrip codes concurrently into one long-format DataFrame, failed scrips as one row with an Error"""
+        codes = list(dict.fromkeys(script_codes))
+        frames: Dict[Any, pd.DataFrame] = {}
+
+        def _one(code):
+            df = self._recurse_until_today(code, from_month, from_year)
+            if quarterly:
+                df = self._get_quarterly_dates(df)
+            return df
 
-        return df
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {pool.submit(_one, code): code for code in codes}
+            for fut in as_completed(futures):
+                code = futures[fut]
+                try:
+                    df = fut.result().copy()
+                    df["Error"] = None
+                except Exception as e:
+                    print(f"[WARN] Scrip {code} failed: {e!r}")
+                    df = pd.DataFrame({"Quarter End": [None], "Close": [float("nan")], "Error": [repr(e)]})
+                df.insert(0, "Scrip Code", str(code))
+                frames[code] = df
+
+        ## keep the caller's order rather than completion order
+        ordered = [frames[code] for code in codes]
+        if not ordered:
+            return pd.DataFrame(columns=["Scrip Code", "Quarter End", "Close", "Error"])
+        return pd.concat(ordered, ignore_index=True)
 
 
 if __name__ == "__main__":
     scraper = bse_scraper_2()
 
-    """Add this functionality to_month and to_year later"""
+    """to_month and to_year bound the POST through hidToDate"""
     # df = scraper._get_monthly_table(500400, 3, 2024, 12, 2024) 
     # df = scraper._get_monthly_table(500400, 3, 2015)
 
-    """Testing iterating over upto the current month and year"""
+    """Testing the planned fetch upto the current month and year (set months_per_post to split it into windows)"""
     df = scraper._recurse_until_today(500400, 3, 2020)
     df = scraper._get_quarterly_dates(df)
     print(df)
+
+    """With the local store, repeated queries only hit BSE for the open month"""
+    # scraper = bse_scraper_2(store=monthly_store("bse_store.sqlite"))
+
+    """Batch fetch for a watchlist"""
+    # df = scraper._fetch_many([500400, 500325, 532540], 3, 2020, quarterly=True)
@@ -0,0 +1,226 @@
+"""
+Local scrip master: code -> short name, full name, ISIN, status, listing month.
+
+    BSE_SCRIPS_PATH=bse_scrips.sqlite python bse_scrips.py import ListOfScrips.csv
+    python bse_scrips.py search tata
+"""
+from __future__ import annotations
+
+import bisect
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, NamedTuple, Optional
+
+from bse_lazy import lazy
+from bse_store import month_index
+
+pd = lazy("pandas")
+
+## CSV header patterns -> our column, the first matching header wins
+_CSV_COLUMNS = {
+    "code": r"^(security|scrip)\s*code$|^code$",
+    "name": r"^(security|scrip)\s*id$|^symbol$",
+    "title": r"^(security|scrip|issuer|company)\s*name$|^name$",
+    "status": r"^status$",
+    "isin": r"^isin",
+    "listed": r"list(ing|ed).*date",
+}
+
+
+class scrip_info(NamedTuple):
+    code: str
+    name: Optional[str] = None ## short id, what the page carries in hidCompanyVal (RELIANCE)
+    title: Optional[str] = None ## full security name
+    isin: Optional[str] = None
+    status: Optional[str] = None ## Active, Suspended, Delisted as in BSE's list
+    listed: Optional[int] = None ## month index of the listing date
+    first_period: Optional[int] = None ## first month with data in a fetch that asked from checked_from
+    checked_from: Optional[int] = None
+    source: str = "harvest" ## "csv" or "harvest"
+
+    @property
+    def earliest(self) -> Optional[int]:
+        """ Listing month, else the first month BSE had data for"""
+        return self.listed if self.listed is not None else self.first_period
+
+    @property
+    def delisted(self) -> bool:
+        return (self.status or "").strip().lower() == "delisted"
+
+
+class scrip_master:
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.environ.get("BSE_SCRIPS_PATH") or ":memory:"
+        self._lock = threading.Lock()
+        ## every connect to ":memory:" would be a new empty database, keep the one
+        self._memory = sqlite3.connect(":memory:", check_same_thread=False) if self.path == ":memory:" else None
+        self._by_code: Dict[str, scrip_info] = {}
+        self._names: List[tuple] = [] ## sorted (upper-case name or title, code)
+        with self._connect() as con:
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS scrips ("
+                " code TEXT PRIMARY KEY, name TEXT, title TEXT, isin TEXT, status TEXT,"
+                " listed INTEGER, first_period INTEGER, checked_from INTEGER, source TEXT NOT NULL, updated REAL NOT NULL)"
+            )
+            rows = con.execute(
+                "SELECT code, name, title, isin, status, listed, first_period, checked_from, source FROM scrips"
+            ).fetchall()
+        for row in rows:
+            self._by_code[row[0]] = scrip_info(*row)
+        self._names = sorted(key for info in self._by_code.values() for key in self._keys(info))
+        self._complete = any(info.source == "csv" for info in self._by_code.values())
+
+    @contextmanager
+    def _connect(self):
+        if self._memory is not None:
+            with self._memory:
+                yield self._memory
+            return
+        con = sqlite3.connect(self.path, timeout=30)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    @staticmethod
+    def _keys(info: scrip_info) -> List[tuple]:
+        return [(n.upper(), info.code) for n in {info.name, info.title} if n]
+
+    def __len__(self) -> int:
+        return len(self._by_code)
+
+    def __contains__(self, code) -> bool:
+        return str(code).strip() in self._by_code
+
+    def get(self, code) -> Optional[scrip_info]:
+        return self._by_code.get(str(code).strip())
+
+    @property
+    def complete(self) -> bool:
+        """ True once BSE's full list was imported, so a missing code is not a BSE scrip"""
+        return self._complete
+
+    def search(self, prefix: str, limit: int = 10) -> List[scrip_info]:
+        """ Scrips whose short or full name starts with prefix (case insensitive), by name"""
+        prefix = prefix.strip().upper()
+        if not prefix:
+            return []
+        out, seen = [], set()
+        names = self._names
+        for i in range(bisect.bisect_left(names, (prefix,)), len(names)):
+            name, code = names[i]
+            if not name.startswith(prefix) or len(out) >= limit:
+                break
+            if code not in seen:
+                seen.add(code)
+                out.append(self._by_code[code])
+        return out
+
+    def _upsert(self, infos: List[scrip_info]) -> None:
+        now = time.time()
+        with self._lock:
+            with self._connect() as con:
+                con.executemany(
+                    "INSERT INTO scrips (code, name, title, isin, status, listed, first_period, checked_from, source, updated)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                    " ON CONFLICT(code) DO UPDATE SET name = excluded.name, title = excluded.title,"
+                    " isin = excluded.isin, status = excluded.status, listed = excluded.listed,"
+                    " first_period = excluded.first_period, checked_from = excluded.checked_from,"
+                    " source = excluded.source, updated = excluded.updated",
+                    [(*info, now) for info in infos],
+                )
+            if len(infos) > 64:
+                ## an import: one sort instead of thousands of inserts
+                self._by_code.update((info.code, info) for info in infos)
+                self._names = sorted(key for info in self._by_code.values() for key in self._keys(info))
+            else:
+                ## copy on write, a search running in another thread keeps its list
+                names = list(self._names)
+                for info in infos:
+                    old = self._by_code.get(info.code)
+                    if old is not None:
+                        for key in self._keys(old):
+                            i = bisect.bisect_left(names, key)
+                            if i < len(names) and names[i] == key:
+                                del names[i]
+                    self._by_code[info.code] = info
+                    for key in self._keys(info):
+                        bisect.insort(names, key)
+                self._names = names
+            self._complete |= any(info.source == "csv" for info in infos)
+
+    def seen(self, code, name: Optional[str]) -> None:
+        """ A page for code was harvested and carried name in hidCompanyVal"""
+        code, name = str(code).strip(), (name or "").strip()
+        if not name:
+            return
+        info = self._by_code.get(code)
+        if info is None:
+            self._upsert([scrip_info(code, name=name)])
+        elif info.name != name:
+            self._upsert([info._replace(name=name)])
+
+    def saw_first(self, code, period: int, asked_from: int) -> None:
+        """ A fetch from asked_from found nothing before period"""
+        info = self._by_code.get(str(code).strip()) or scrip_info(str(code).strip())
+        if info.checked_from is None or asked_from <= info.checked_from:
+            self._upsert([info._replace(first_period=period, checked_from=asked_from)])
+
+    def start_for(self, code, start: int) -> int:
+        """ start, moved up past the months known to have no data (before the listing, or an empty stretch seen before)"""
+        info = self._by_code.get(str(code).strip())
+        if info is None:
+            return start
+        if info.listed is not None:
+            start = max(start, info.listed)
+        ## the empty stretch is only known from checked_from on, data may exist before it
+        if info.first_period is not None and info.checked_from is not None and info.checked_from <= start:
+            start = max(start, info.first_period)
+        return start
+
+    def import_csv(self, path) -> int:
+        """ Load BSE's scrip list (or any CSV with a code column); returns the number of scrips imported"""
+        df = pd.read_csv(path, dtype=str, keep_default_na=False)
+        cols = {}
+        for key, pattern in _CSV_COLUMNS.items():
+            cols[key] = next((c for c in df.columns if re.search(pattern, str(c).strip(), re.I)), None)
+        if cols["code"] is None:
+            raise ValueError("No scrip code column (e.g. 'Security Code') in the CSV.")
+
+        def column(key):
+            if cols[key] is None:
+                return [None] * len(df)
+            return [v.strip() or None for v in df[cols[key]].astype(str)]
+
+        listed = [None] * len(df)
+        if cols["listed"] is not None:
+            dates = pd.to_datetime(df[cols["listed"]], errors="coerce", dayfirst=True)
+            listed = [None if pd.isna(d) else month_index(d.month, d.year) for d in dates]
+
+        infos = []
+        for code, name, title, isin, status, month in zip(column("code"), column("name"), column("title"),
+                                                           column("isin"), column("status"), listed):
+            if not code or not code.isdigit():
+                continue
+            old = self._by_code.get(code)
+            infos.append(scrip_info(code, name, title, isin, status, month,
+                                    old.first_period if old else None, old.checked_from if old else None, "csv"))
+        self._upsert(infos)
+        return len(infos)
+
+
+if __name__ == "__main__":
+    master = scrip_master()
+    if len(sys.argv) == 3 and sys.argv[1] == "import":
+        print(f"Imported {master.import_csv(sys.argv[2])} scrips into {master.path}")
+    elif len(sys.argv) == 3 and sys.argv[1] == "search":
+        for info in master.search(sys.argv[2]):
+            print(info.code, info.name or "", info.title or "", info.status or "")
+    else:
+        print(__doc__)
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import datetime as dt
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from bse_frames import MONTHS, label_index, month_indices
+from bse_lazy import lazy
+
+pd = lazy("pandas")
+
+
+def month_index(month: int, year: int) -> int:
+    """ Months since year 0, so that consecutive months differ by exactly one"""
+    return year * 12 + (month - 1)
+
+
+def month_from_index(idx: int) -> tuple:
+    """ Inverse of month_index, returns (month, year)"""
+    return idx % 12 + 1, idx // 12
+
+
+def label_to_index(label: str) -> int:
+    """ 'Mar 24' or 'Mar 2024' -> month index (frames go through bse_frames.month_indices)"""
+    return label_index(label)
+
+
+def index_to_label(idx: int) -> str:
+    """ Month index -> the 'Mar 24' label BSE uses"""
+    month, year = month_from_index(idx)
+    return f"{MONTHS[month - 1]} {year % 100:02d}"
+
+
+class monthly_store:
+    """ Local SQLite cache of parsed monthly closes, keyed by (scrip, month)"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.environ.get("BSE_STORE_PATH", "bse_store.sqlite")
+        self._lock = threading.Lock()
+        with self._connect() as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS monthly ("
+                " scrip TEXT NOT NULL, period INTEGER NOT NULL, close REAL,"
+                " fetched INTEGER NOT NULL, PRIMARY KEY (scrip, period))"
+            )
+            ## earliest month we have ever asked BSE for, per scrip
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS coverage ("
+                " scrip TEXT PRIMARY KEY, first_period INTEGER NOT NULL)"
+            )
+            ## fetch strategy that last worked per scrip, see bse_router
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS strategy ("
+                " scrip TEXT PRIMARY KEY, name TEXT NOT NULL, updated REAL NOT NULL)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        con = sqlite3.connect(self.path, timeout=30)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def covers(self, scrip, from_period: int) -> bool:
+        with self._connect() as con:
+            row = con.execute("SELECT first_period FROM coverage WHERE scrip = ?", (str(scrip),)).fetchone()
+        return row is not None and row[0] <= from_period
+
+    def newest_final(self, scrip) -> Optional[int]:
+        """ Latest month whose row was fetched after the month had closed"""
+        with self._connect() as con:
+            row = con.execute(
+                "SELECT MAX(period) FROM monthly WHERE scrip = ? AND fetched > period", (str(scrip),)
+            ).fetchone()
+        return row[0] if row else None
+
+    def save(self, scrip, df: pd.DataFrame, from_period: int) -> None:
+        """ Upsert the ['Quarter End', 'Close'] rows of df and extend the coverage to from_period"""
+        today = dt.date.today()
+        fetched = month_index(today.month, today.year)
+        periods = month_indices(df["Quarter End"])
+        closes = df["Close"].astype("float64")
+        rows = [
+            (str(scrip), int(period), None if pd.isna(close) else float(close), fetched)
+            for period, close in zip(periods, closes) if period >= 0
+        ]
+
+        with self._lock, self._connect() as con:
+            con.executemany(
+                "INSERT INTO monthly (scrip, period, close, fetched) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT(scrip, period) DO UPDATE SET close = excluded.close, fetched = excluded.fetched",
+                rows,
+            )
+            con.execute(
+                "INSERT INTO coverage (scrip, first_period) VALUES (?, ?)"
+                " ON CONFLICT(scrip) DO UPDATE SET first_period = MIN(first_period, excluded.first_period)",
+                (str(scrip), from_period),
+            )
+
+    def load(self, scrip, from_period: int, to_period: Optional[int] = None) -> pd.DataFrame:
+        """ Cached rows from from_period onwards (up to to_period), in the same shape _get_monthly_table returns"""
+        with self._connect() as con:
+            rows = con.execute(
+                "SELECT period, close FROM monthly WHERE scrip = ? AND period >= ? AND period <= ? ORDER BY period",
+                (str(scrip), from_period, to_period if to_period is not None else 2 ** 62),
+            ).fetchall()
+        return pd.DataFrame({
+            "Quarter End": [index_to_label(p) for p, _ in rows],
+            "Close": pd.Series([c for _, c in rows], dtype="float64"),
+        })
+
+    def last_strategy(self, scrip) -> Optional[tuple]:
+        """ (strategy name, unix time it last worked) for scrip, None if never recorded"""
+        with self._connect() as con:
+            row = con.execute("SELECT name, updated FROM strategy WHERE scrip = ?", (str(scrip),)).fetchone()
+        return tuple(row) if row else None
+
+    def remember_strategy(self, scrip, name: str) -> None:
+        with self._lock, self._connect() as con:
+            con.execute(
+                "INSERT INTO strategy (scrip, name, updated) VALUES (?, ?, ?)"
+                " ON CONFLICT(scrip) DO UPDATE SET name = excluded.name, updated = excluded.updated",
+                (str(scrip), name, time.time()),
+            )
@@ -0,0 +1,184 @@
+""" Client-side flow control for requests to one BSE host: rate, AIMD concurrency window, circuit breaker, retries"""
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import bse_metrics
+from bse_lazy import lazy
+
+httpx = lazy("httpx")
+
+## worth another try after a pause; a plain 500 is how WebForms rejects stale tokens, the caller re-harvests instead
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+## the server telling us to slow down
+THROTTLE_STATUSES = frozenset({429, 503})
+
+
+class circuit_open(RuntimeError):
+    """ Raised instead of sending a request while the host's breaker is open"""
+
+
+class token_bucket:
+    """ rate tokens per second, up to burst saved up"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._stamp = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float) -> None:
+        """ Hand out nothing for the next seconds (the server sent Retry-After)"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def take(self) -> None:
+        ## the lock queues waiters so tokens go out in arrival order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+                self._stamp = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class host_limiter:
+    """ Rate, concurrency and breaker state for one host on one event loop"""
+
+    def __init__(self, max_concurrency: int = 4, rate: float = 5.0, burst: Optional[float] = None,
+                 min_concurrency: int = 1, slow_factor: float = 4.0, slow_floor: float = 0.5,
+                 failures_to_open: int = 5, cooldown: float = 30.0):
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.window = float(max_concurrency)
+        self.bucket = token_bucket(rate, burst if burst is not None else max(1.0, float(max_concurrency)))
+        self.slow_factor = slow_factor
+        self.slow_floor = slow_floor ## seconds over the best latency before "slow" counts at all
+        self.failures_to_open = failures_to_open
+        self.cooldown = cooldown
+
+        self._active = 0
+        self._changed = asyncio.Condition()
+        self._best_latency: Optional[float] = None
+        self._smoothed_latency: Optional[float] = None
+        self._last_decrease = 0.0
+        self._failures = 0
+        self._open_until = 0.0
+        self._probing = False
+        self.stats = {"requests": 0, "throttled": 0, "errors": 0, "decreases": 0, "breaker_opens": 0, "rejected": 0}
+
+    @property
+    def state(self) -> str:
+        if self._failures < self.failures_to_open:
+            return "closed"
+        return "open" if time.monotonic() < self._open_until else "half-open"
+
+    def _admit(self) -> None:
+        """ Raise circuit_open unless the breaker lets this request through"""
+        state = self.state
+        if state == "closed":
+            return
+        if state == "half-open" and not self._probing:
+            self._probing = True ## one probe decides whether we close again
+            return
+        self.stats["rejected"] += 1
+        bse_metrics.count("bse_breaker_total", event="rejected")
+        wait = max(0.0, self._open_until - time.monotonic())
+        raise circuit_open(f"Too many failures from the server, not sending requests for another {wait:.0f}s")
+
+    @asynccontextmanager
+    async def slot(self):
+        """ Wait for the breaker, a place in the window and a rate token, in that order"""
+        self._admit()
+        probe = self._probing
+        try:
+            async with self._changed:
+                await self._changed.wait_for(lambda: self._active < max(self.min_concurrency, int(self.window)))
+                self._active += 1
+        except BaseException:
+            if probe:
+                self._probing = False
+            raise
+        try:
+            await self.bucket.take()
+            self.stats["requests"] += 1
+            yield
+        finally:
+            if probe:
+                self._probing = False
+            async with self._changed:
+                self._active -= 1
+                self._changed.notify_all()
+
+    def record(self, status: Optional[int], latency: float, retry_after: Optional[float] = None) -> None:
+        """ Feed back one finished request; status None means a timeout or transport error"""
+        now = time.monotonic()
+        failed = status is None or status in RETRY_STATUSES
+        throttled = status is None or status in THROTTLE_STATUSES
+
+        if retry_after:
+            self.bucket.pause(retry_after)
+
+        if failed:
+            self.stats["errors"] += 1
+            self.stats["throttled"] += throttled
+        if failed and status != 429:
+            self._failures += 1
+            if self._failures == self.failures_to_open or self.state == "half-open":
+                ## (re)open: nothing goes out until the cooldown has passed
+                self._failures = max(self._failures, self.failures_to_open)
+                self._open_until = now + self.cooldown
+                self.stats["breaker_opens"] += 1
+                bse_metrics.count("bse_breaker_total", event="open")
+                print(f"[WARN] Circuit open for {self.cooldown:.0f}s after {self._failures} failures")
+        elif not failed and status < 500:
+            if self._failures >= self.failures_to_open:
+                print("[INFO] Circuit closed again")
+            self._failures = 0
+            self._best_latency = latency if self._best_latency is None else min(self._best_latency, latency)
+            self._smoothed_latency = latency if self._smoothed_latency is None else 0.8 * self._smoothed_latency + 0.2 * latency
+
+        slow = (not failed and self._best_latency is not None
+                and latency > max(self.slow_factor * self._best_latency, self._best_latency + self.slow_floor))
+        if throttled or slow:
+            if now - self._last_decrease > (self._smoothed_latency or 1.0):
+                self.window = max(float(self.min_concurrency), self.window / 2)
+                self._last_decrease = now
+                self.stats["decreases"] += 1
+        elif not failed and status < 500:
+            self.window = min(float(self.max_concurrency), self.window + 1 / self.window)
+
+
+class retry_policy:
+    """ attempts in total per request, with full-jitter exponential backoff between them"""
+
+    def __init__(self, attempts: int = 4, base: float = 0.5, cap: float = 20.0):
+        self.attempts = attempts
+        self.base = base
+        self.cap = cap
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """ Seconds to wait before attempt number attempt (1 = the first retry)"""
+        backoff = random.uniform(0, min(self.cap, self.base * 2 ** (attempt - 1)))
+        return max(backoff, retry_after or 0.0)
+
+
+def retry_after(r: Optional[httpx.Response]) -> Optional[float]:
+    """ Retry-After in seconds (the delta form; BSE does not send dates)"""
+    if r is None:
+        return None
+    try:
+        return max(0.0, float(r.headers.get("Retry-After", "")))
+    except ValueError:
+        return None
@@ -0,0 +1,51 @@
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+## inputs that carry the company of the page they were harvested from
+SCRIP_SPECIFIC_INPUTS = (
+    "ctl00$ContentPlaceHolder1$hidCompanyVal",
+    "ctl00$ContentPlaceHolder1$scripname",
+    "ctl00$ContentPlaceHolder1$scriptnameTO",
+    "ctl00$ContentPlaceHolder1$scriptnamemf",
+    "ctl00$ContentPlaceHolder1$ScriptnameDebt",
+)
+
+
+class token_cache:
+    """ Harvested WebForms inputs (__VIEWSTATE, __EVENTVALIDATION, hidden fields, ...) per scrip, kept for ttl seconds"""
+
+    def __init__(self, ttl: float = 900, share_across_scrips: bool = True):
+        self.ttl = ttl
+        self.share_across_scrips = share_across_scrips
+        self._entries: Dict[str, Tuple[float, Dict[str, str]]] = {}
+        self._latest: Optional[Tuple[float, Dict[str, str]]] = None
+        self._lock = threading.Lock()
+
+    def _fresh(self, entry) -> bool:
+        return entry is not None and (time.monotonic() - entry[0]) < self.ttl
+
+    def get(self, scrip, shared: bool = True) -> Optional[Dict[str, str]]:
+        """ The scrip's inputs; with shared (and share_across_scrips) another scrip's if it has none"""
+        with self._lock:
+            entry = self._entries.get(str(scrip))
+            if self._fresh(entry):
+                return dict(entry[1])
+            if shared and self.share_across_scrips and self._fresh(self._latest):
+                inputs = dict(self._latest[1])
+                for name in SCRIP_SPECIFIC_INPUTS:
+                    inputs[name] = ""
+                return inputs
+        return None
+
+    def put(self, scrip, inputs: Dict[str, str]) -> None:
+        entry = (time.monotonic(), dict(inputs))
+        with self._lock:
+            self._entries[str(scrip)] = entry
+            self._latest = entry
+
+    def invalidate(self, scrip) -> None:
+        """ Drop the scrip's entry and the shared one, the server no longer accepts them"""
+        with self._lock:
+            self._entries.pop(str(scrip), None)
+            self._latest = None
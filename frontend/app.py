@@ -5,7 +5,8 @@ if sys.platform.startswith("win"):
 
 import streamlit as st 
 # from bse_scraper import Scraper_bse as bse
-import pandas as pd
+import datetime as dt
+import os
 from pathlib import Path
 
 # print("before: ",sys.path)
@@ -17,10 +18,37 @@ if str(ROOT) not in sys.path:
 ## importing after adding to the system path!
 # from bse_scraper import Scraper_bse as bse
 from bse_scraper_v2 import bse_scraper_2 as bse
+from bse_router import strategy_router
+from bse_scrips import scrip_master
+from bse_store import index_to_label, month_index, monthly_store
+from bse_cache import result_cache
+## pandas, httpx, lxml & co. load on the first fetch, not on the first page view
 
 ## defining our class
 # s = bse(headless=True, verbose=False)
-s = bse()
+
+## one scraper and one result cache per server process, shared by every session
+@st.cache_resource
+def _shared_scrips():
+    ## like the store: on disk only with BSE_SCRIPS_PATH, else in memory for this process
+    return scrip_master(os.environ.get("BSE_SCRIPS_PATH") or ":memory:")
+
+@st.cache_resource
+def _shared_scraper():
+    ## with BSE_STORE_PATH the monthly closes are shared with the API and the batch refresh through SQLite
+    store = monthly_store(os.environ["BSE_STORE_PATH"]) if os.environ.get("BSE_STORE_PATH") else None
+    return bse(store=store, scrips=_shared_scrips())
+
+## form POST first, then the CSV download, then a browser; remembers what worked per scrip
+@st.cache_resource
+def _shared_router():
+    return strategy_router(_shared_scraper())
+
+@st.cache_resource
+def _shared_results():
+    return result_cache(closed_ttl=12 * 3600, open_ttl=300)
+
+s = _shared_scraper()
 
 
 ## App UI
@@ -118,7 +146,7 @@ st.title("BSE Quarter-End Closing Prices")
 st.caption("Source: bseindia.com monthly history. Enter a 6-digit BSE scrip code (e.g., 500325 for RELIANCE, 500400 for TATAPOWER).")
 
 scrip_code = st.text_input("BSE Scrip Code", value="500400").strip()
-from_year = st.number_input("From year", min_value=2000, max_value=pd.Timestamp.today().year, value=2024, step=1)
+from_year = st.number_input("From year", min_value=2000, max_value=dt.date.today().year, value=2024, step=1)
 
 ## New code for bse_scraper 2
 # from_month_num = st.number_input(
@@ -131,20 +159,45 @@ MONTHS = [
     "July", "August", "September", "October", "November", "December"
 ]
 # to_month = st.number_input("To month", min_value=1, max_value=12, value=12, step=1)
-# to_year = st.number_input("To year", min_value=2000, max_value=pd.Timestamp.today().year, value=2025, step=1)
+# to_year = st.number_input("To year", min_value=2000, max_value=dt.date.today().year, value=2025, step=1)
 # start_idx = max(0, int(from_month_num) - 1)
 # selectable_months = MONTHS[start_idx:]  # slice from the selected start month to December
 selected_month_name = st.selectbox("Start month (pick from list)", options=MONTHS, index=0)
 from_month = MONTHS.index(selected_month_name) + 1  # Convert month name back to month number
 
 if st.button("Get Prices"):
+    ## checked against the local scrip master, no request to BSE for codes that cannot work
+    scrips = _shared_scrips()
+    info = scrips.get(scrip_code)
     if not scrip_code.isdigit():
-        st.error("Please enter a numeric 6-digit BSE scrip code.")
+        matches = scrips.search(scrip_code, limit=5)
+        if matches:
+            st.error("Please enter the numeric scrip code. Matching names: " + ", ".join(f"{m.code} ({m.name or m.title})" for m in matches))
+        else:
+            st.error("Please enter a numeric 6-digit BSE scrip code.")
+    elif info is None and scrips.complete:
+        st.error(f"{scrip_code} is not a BSE scrip code.")
+    elif info is not None and info.delisted:
+        st.error(f"{scrip_code} ({info.name or info.title}) is delisted, BSE has no price history for it.")
     else:
+        if info is not None and info.earliest is not None and month_index(from_month, int(from_year)) < info.earliest:
+            st.info(f"Prices for {info.name or info.title or scrip_code} start in {index_to_label(info.earliest)}.")
         with st.spinner("Fetching from BSE..."):
+            import pandas as pd
+            import bse_export
+            from bse_frames import by_month
+            table = st.empty()
             try:
                 # df = s._get_qtrly_dates(scrip_code, from_year=int(from_year))
-                df = s._recurse_until_today(scrip_code, from_month=int(from_month), from_year=int(from_year))
+                ## show the quarter ends as each POST comes back instead of after the last one;
+                ## cached closed months come first and only the stale open month is fetched again
+                chunks = []
+                for chunk in _shared_results().iter_or_fetch(_shared_router().iter_until_today, scrip_code, int(from_month), int(from_year)):
+                    chunks.append(chunk)
+                    df = by_month(pd.concat(chunks, ignore_index=True))
+                    table.dataframe(s._get_quarterly_dates(df).astype({"Quarter End": str}), width="stretch")
+                if not chunks:
+                    df = pd.DataFrame({"Quarter End": pd.Series(dtype="object"), "Close": pd.Series(dtype="float64")})
                 df = s._get_quarterly_dates(df)
         
                 # st.write("DEBUG: returned", "shape:", getattr(df, "shape", None))
@@ -153,19 +206,27 @@ if st.button("Get Prices"):
                     st.error("Scraper returned None (check _get_qtrly_dates returns a DataFrame)")
 
                 elif isinstance(df, pd.DataFrame) and df.empty:
+                    table.empty()
                     st.warning("No quarter-end data found. Check the scrip code or try another.")
                 
                 else:
                     # pretty display
                     show = df.copy()
                     show["Quarter End"] = show["Quarter End"].astype(str)
-                    st.dataframe(show, width="stretch")
+                    table.dataframe(show, width="stretch")
                     st.download_button(
                         "Download CSV",
                         data=show.to_csv(index=False).encode(),
                         file_name=f"bse_quarterlies_{scrip_code}.csv",
                         mime="text/csv"
                     )
+                    ## typed columns (scrip, months since 1970-01, float close), loads without string parsing
+                    st.download_button(
+                        "Download Parquet",
+                        data=bse_export.to_bytes(bse_export.to_table({scrip_code: df})),
+                        file_name=f"bse_quarterlies_{scrip_code}.parquet",
+                        mime=bse_export.MEDIA_TYPES["parquet"]
+                    )
             except Exception as e:
                 st.error(f"Failed to fetch data: The dates are wrong or the scrip code is invalid.")
                 # st.info("If this persists, selectors on BSE may have changed; see bse_quarterlies.py comments to tweak month/year/submit selectors.")
\ No newline at end of file
@@ -0,0 +1,25 @@
+#!/usr/bin/env bash
+# Container entrypoint. APP_MODE picks what runs on $PORT:
+#   streamlit (default) - the Streamlit UI
+#   api                 - the headless JSON/NDJSON/Arrow API (api/app.py)
+#   both                - Streamlit on $PORT and the API on $API_PORT (default 8081)
+# SQLite files, none is written unless its variable is set:
+#   BSE_STORE_PATH      - monthly closes (bse_store.py); "both" defaults it to /tmp/bse_store.sqlite
+#   BSE_SCRIPS_PATH     - the app's scrip master (bse_scrips.py), in memory when unset
+set -e
+PORT="${PORT:-8080}"
+
+case "${APP_MODE:-streamlit}" in
+  api)
+    exec uvicorn api.app:app --host 0.0.0.0 --port "$PORT"
+    ;;
+  both)
+    ## two processes: they share fetched months through the SQLite store, not through memory
+    export BSE_STORE_PATH="${BSE_STORE_PATH:-/tmp/bse_store.sqlite}"
+    uvicorn api.app:app --host 0.0.0.0 --port "${API_PORT:-8081}" &
+    exec streamlit run frontend/app.py --server.address=0.0.0.0 --server.port="$PORT"
+    ;;
+  *)
+    exec streamlit run frontend/app.py --server.address=0.0.0.0 --server.port="$PORT"
+    ;;
+esac
@@ -0,0 +1,99 @@
+"""
+Month windows across year boundaries, no network.
+
+    python -m pytest -q tests
+
+benchmarks/year_boundary.py runs the same ranges end to end against the stand-in server.
+"""
+import datetime as dt
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from bse_scraper_v2 import bse_scraper_2
+from bse_store import month_from_index, month_index
+
+DEC_23, JAN_24 = month_index(12, 2023), month_index(1, 2024)
+
+
+def _current() -> int:
+    today = dt.date.today()
+    return month_index(today.month, today.year)
+
+
+def _covers(windows, start, end, step):
+    """ windows are in order, contiguous, at most step months each and cover [start, end]"""
+    assert windows[0][0] == start and windows[-1][1] == end
+    for (lo, hi), (next_lo, _) in zip(windows, windows[1:]):
+        assert next_lo == hi + 1
+    for lo, hi in windows:
+        assert lo <= hi and (step is None or hi - lo + 1 <= step)
+
+
+@pytest.fixture
+def scraper():
+    ## nothing here may reach a server; a closed port makes any request fail loudly
+    s = bse_scraper_2()
+    s.base_url = "http://127.0.0.1:9"
+    return s
+
+
+def test_dec_to_jan_are_consecutive_indices():
+    assert JAN_24 == DEC_23 + 1
+    assert month_from_index(DEC_23) == (12, 2023)
+    assert month_from_index(JAN_24) == (1, 2024)
+
+
+@pytest.mark.parametrize("year", [1999, 2000, 2023, 2024, 2099])
+@pytest.mark.parametrize("month", range(1, 13))
+def test_month_from_index_inverts_month_index(month, year):
+    assert month_from_index(month_index(month, year)) == (month, year)
+
+
+@pytest.mark.parametrize("step", [None, 1, 2, 5, 12])
+def test_dec_to_jan(scraper, step):
+    windows = scraper._plan_month_ranges(DEC_23, JAN_24, step)
+    _covers(windows, DEC_23, JAN_24, step)
+    assert [month_from_index(lo) for lo, _ in windows][0] == (12, 2023)
+
+
+@pytest.mark.parametrize("step", [None, 1, 2, 5, 12])
+def test_across_several_years(scraper, step):
+    start, end = month_index(11, 2023), month_index(2, 2026)
+    _covers(scraper._plan_month_ranges(start, end, step), start, end, step)
+
+
+@pytest.mark.parametrize("step", [None, 1, 3])
+@pytest.mark.parametrize("month", [DEC_23, JAN_24])
+def test_one_month_range(scraper, month, step):
+    assert scraper._plan_month_ranges(month, month, step) == [(month, month)]
+
+
+@pytest.mark.parametrize("step", [None, 1, 3])
+def test_range_starting_in_the_current_month(scraper, step):
+    current = _current()
+    assert scraper._plan_month_ranges(current, current, step) == [(current, current)]
+
+
+def test_step_defaults_to_months_per_post(scraper):
+    scraper.months_per_post = 2
+    _covers(scraper._plan_month_ranges(DEC_23, month_index(5, 2024)), DEC_23, month_index(5, 2024), 2)
+
+
+@pytest.mark.parametrize("step", [None, 1, 3])
+def test_from_after_today_plans_nothing(scraper, step):
+    current = _current()
+    assert scraper._plan_month_ranges(current + 1, current, step) == []
+    assert scraper._plan_month_ranges(current + 13, current, step) == []
+
+
+def test_fetch_from_after_today_sends_nothing(scraper):
+    month, year = month_from_index(_current() + 1)
+    df = scraper._fetch_until_today(500400, month, year)
+    assert df.empty
+    assert list(df.columns) == ["Quarter End", "Close"]